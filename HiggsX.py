@@ -7,7 +7,7 @@ from interface import MarketMonitor
 from telegram_bot import process_updates
 # Importa el scheduler
 from scheduler import scheduler_loop
-from config import TELEGRAM_HIGGS_THREAD_ID
+from config import TELEGRAM_HIGGS_THREAD_ID, TELEGRAM_MAX_CONCURRENT_UPDATES
 
 async def main():
     print(f"[Config] TELEGRAM_HIGGS_THREAD_ID: {TELEGRAM_HIGGS_THREAD_ID}")  # Aquí va el log
@@ -16,7 +16,7 @@ async def main():
     market_monitor.start_monitoring()  # Inicia el monitoreo en segundo plano
     
     # Lanzar la tarea del bot de Telegram
-    telegram_task = asyncio.create_task(process_updates(asyncio.Semaphore(5)))
+    telegram_task = asyncio.create_task(process_updates(asyncio.Semaphore(TELEGRAM_MAX_CONCURRENT_UPDATES)))
     
     # Lanzar el scheduler en un executor para que corra de forma bloqueante
     loop = asyncio.get_event_loop()
@@ -12,9 +12,11 @@ import io
 import requests
 import re
 import time
+import threading
 from datetime import datetime, timedelta
 from matplotlib.lines import Line2D
 from dominance_historical import fetch_historical_dominance
+from market import current_candle_start
 
 from config import (
     TELEGRAM_TOKEN,
@@ -22,6 +24,14 @@ from config import (
     TELEGRAM_HIGGS_THREAD_ID,
     TELEGRAM_SENALES_THREAD_ID,
     COINMARKETCAP_API_KEY,
+    CHART_FILE_ID_MAX_AGE,
+    TELEGRAM_API_BASE,
+)
+from telegram_handler import (
+    send_telegram_photo,
+    get_cached_file_id,
+    remember_file_id,
+    forget_file_id,
 )
 
 # Parámetros de gráfico
@@ -29,6 +39,9 @@ SYMBOL = 'BTC/USD'
 LIMIT = 100
 GRAPH_CACHE_INTERVAL = 60  # segundos
 GRAPH_CACHE = {}
+# Las peticiones de gráfico llegan en paralelo: se genera y sube uno a la vez
+# (matplotlib no es seguro entre hilos y así la segunda reutiliza el file_id)
+_CHART_LOCK = threading.Lock()
 
 # Conexión a Coinbase
 exchange = ccxt.coinbase()
@@ -137,15 +150,16 @@ def plot_candlestick_chart(df: pd.DataFrame, symbol: str, timeframe: str):
     fig.text(0.90, 0.02, "HiggsX - Ulu Labs", ha='center', va='bottom', color='lime', fontsize=7)
     return fig
 
-def send_chart_to_telegram(fig, caption: str, message_thread_id: int = None):
+def send_chart_to_telegram(fig, caption: str, message_thread_id: int = None, cache_key=None):
     """
     Dado un objeto `fig` de matplotlib, lo convierte en PNG y lo envía a Telegram.
+    Si se indica `cache_key`, guarda el file_id devuelto para reutilizarlo.
     """
     buf = io.BytesIO()
     fig.savefig(buf, dpi=150, format='png', facecolor=fig.get_facecolor())
     buf.seek(0)
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendPhoto"
+    url = f"{TELEGRAM_API_BASE}/bot{TELEGRAM_TOKEN}/sendPhoto"
     files = {'photo': buf}
     data = {'chat_id': TELEGRAM_CHAT_ID, 'caption': caption}
     if message_thread_id is not None:
@@ -155,22 +169,38 @@ def send_chart_to_telegram(fig, caption: str, message_thread_id: int = None):
     if resp.status_code != 200:
         print("Error al enviar el gráfico:", resp.text)
     else:
+        remember_file_id(cache_key, resp.json())
         print(f"Gráfico enviado en topic {message_thread_id or 'general'}.")
 
 def send_graphic(_, timeframe_input="1h", __="candlestick", message_thread_id: int=None):
     """
     Función para peticiones de gráficos desde Higgs Handler.
-    Reutiliza cache y llama a plot_candlestick_chart.
+    Si el gráfico de la vela en curso ya se subió, lo reenvía por file_id;
+    si no, reutiliza la figura en cache o llama a plot_candlestick_chart.
     """
+    with _CHART_LOCK:
+        _send_graphic(timeframe_input, message_thread_id)
+
+def _send_graphic(timeframe_input, message_thread_id):
     timeframe = extract_timeframe(timeframe_input)
     cache_key = f"{SYMBOL}_{timeframe}"
     now = time.time()
+    caption = f"{SYMBOL} en {timeframe}"
+
+    # Reutilizar el file_id de Telegram mientras la vela siga siendo la misma
+    file_id_key = (cache_key, current_candle_start(timeframe, now))
+    file_id = get_cached_file_id(file_id_key, CHART_FILE_ID_MAX_AGE)
+    if file_id:
+        if send_telegram_photo(file_id, TELEGRAM_CHAT_ID, message_thread_id, caption=caption):
+            return
+        # Telegram rechazó el file_id: se descarta y se vuelve a subir
+        forget_file_id(file_id_key)
 
     # Reutilizar cache
     if cache_key in GRAPH_CACHE:
         ts, fig = GRAPH_CACHE[cache_key]
         if now - ts < GRAPH_CACHE_INTERVAL:
-            send_chart_to_telegram(fig, f"{SYMBOL} en {timeframe}", message_thread_id)
+            send_chart_to_telegram(fig, caption, message_thread_id, cache_key=file_id_key)
             return
 
     df = get_ohlcv_data(SYMBOL, timeframe, LIMIT)
@@ -180,7 +210,7 @@ def send_graphic(_, timeframe_input="1h", __="candlestick", message_thread_id: i
 
     fig = plot_candlestick_chart(df, SYMBOL, timeframe)
     GRAPH_CACHE[cache_key] = (now, fig)
-    send_chart_to_telegram(fig, f"{SYMBOL} en {timeframe}", message_thread_id)
+    send_chart_to_telegram(fig, caption, message_thread_id, cache_key=file_id_key)
 
 #############################
 # NUEVO: GRÁFICO COMBINADO 6h
@@ -317,7 +347,7 @@ def send_6h_report_chart(caption: str, message_thread_id: int = None):
     fig.savefig(buf, dpi=150, format='png', facecolor=fig.get_facecolor())
     buf.seek(0)
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendPhoto"
+    url = f"{TELEGRAM_API_BASE}/bot{TELEGRAM_TOKEN}/sendPhoto"
     files = {'photo': buf}
     data = {'chat_id': TELEGRAM_CHAT_ID, 'caption': caption}
     if message_thread_id is not None:
@@ -415,7 +445,7 @@ def send_all_dominance_chart(caption: str = "Dominancia BTC/ETH/Others", message
     fig.savefig(buf, dpi=150, format='png', facecolor=fig.get_facecolor())
     buf.seek(0)
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendPhoto"
+    url = f"{TELEGRAM_API_BASE}/bot{TELEGRAM_TOKEN}/sendPhoto"
     files = {'photo': buf}
     data = {'chat_id': TELEGRAM_CHAT_ID, 'caption': caption}
     if message_thread_id is not None:
@@ -0,0 +1,115 @@
+# answer_cache.py
+
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from config import (
+    TIMEFRAME,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_PRICE_BAND,
+)
+from market import current_candle_start
+
+# Marcador que sustituye al @usuario dentro de las respuestas guardadas
+USER_PLACEHOLDER = "{usuario}"
+
+def normalize_question(text: str) -> str:
+    """
+    Normaliza una pregunta para que variantes triviales compartan clave:
+    minúsculas, sin acentos, sin menciones (@usuario), sin signos de
+    puntuación y con espacios colapsados.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"@\w+", " ", text)
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+def market_bucket(ind: dict):
+    """
+    Estado de mercado "grueso" a partir de calculate_indicators:
+      - banda de precio (ANSWER_CACHE_PRICE_BAND dólares)
+      - vela en curso (TIMEFRAME)
+      - régimen del RSI (sobreventa / neutral / sobrecompra)
+      - sentido del MACD respecto a su señal
+    Devuelve None si no hay precio (sin datos no se cachea).
+    """
+    price = ind.get("price")
+    if not isinstance(price, (int, float)):
+        return None
+    rsi = ind.get("rsi")
+    if not isinstance(rsi, (int, float)):
+        rsi_regime = "nd"
+    elif rsi >= 70:
+        rsi_regime = "sobrecompra"
+    elif rsi <= 30:
+        rsi_regime = "sobreventa"
+    else:
+        rsi_regime = "neutral"
+    macd, signal = ind.get("macd"), ind.get("macd_signal")
+    if isinstance(macd, (int, float)) and isinstance(signal, (int, float)):
+        macd_regime = "alcista" if macd >= signal else "bajista"
+    else:
+        macd_regime = "nd"
+    return (
+        int(price // ANSWER_CACHE_PRICE_BAND),
+        current_candle_start(TIMEFRAME),
+        rsi_regime,
+        macd_regime,
+    )
+
+class AnswerCache:
+    """
+    Cache LRU con TTL de respuestas de GPT.
+    Clave: (pregunta normalizada, market_bucket).
+    """
+    def __init__(self, ttl=ANSWER_CACHE_TTL, max_size=ANSWER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, question: str, ind: dict):
+        bucket = market_bucket(ind)
+        if bucket is None:
+            return None
+        return (normalize_question(question), bucket)
+
+    def get(self, key, username=None):
+        """
+        Devuelve la respuesta guardada (personalizada para `username`)
+        o None si no existe o expiró.
+        """
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[1] >= self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            body = entry[0]
+        return body.replace(USER_PLACEHOLDER, f"@{username}" if username else "")
+
+    def put(self, key, answer: str, username=None):
+        """Guarda `answer`, reemplazando la mención a `username` por un marcador."""
+        if key is None or not answer:
+            return
+        if username:
+            answer = answer.replace(f"@{username}", USER_PLACEHOLDER)
+        with self._lock:
+            self._entries[key] = (answer, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+# Instancia compartida por el handler de Telegram
+ANSWER_CACHE = AnswerCache()
@@ -0,0 +1,147 @@
+# api_quota.py
+
+import time
+import logging
+import threading
+from collections import deque, defaultdict
+from datetime import datetime, timezone
+
+from config import (
+    CMC_DAILY_BUDGET,
+    CMC_MINUTE_BUDGET,
+    COINGECKO_DAILY_BUDGET,
+    COINGECKO_MINUTE_BUDGET,
+    NEWSAPI_DAILY_BUDGET,
+    NEWSAPI_MINUTE_BUDGET,
+    QUOTA_MAX_TTL_STRETCH,
+)
+from memoria import add_api_usage, get_api_usage
+
+PROVIDER_CMC = "coinmarketcap"
+PROVIDER_COINGECKO = "coingecko"
+PROVIDER_NEWSAPI = "newsapi"
+
+# Ritmo mínimo de día transcurrido para proyectar el consumo (evita alarmas a las 00:05)
+MIN_DAY_FRACTION = 1 / 24
+
+def _utc_day(now=None):
+    return datetime.fromtimestamp(now or time.time(), tz=timezone.utc).strftime("%Y-%m-%d")
+
+def _day_fraction(now):
+    """Fracción del día UTC transcurrida."""
+    dt = datetime.fromtimestamp(now, tz=timezone.utc)
+    return (dt.hour * 3600 + dt.minute * 60 + dt.second) / 86400
+
+class QuotaManager:
+    """
+    Cuenta las llamadas a cada proveedor con cuota (por endpoint) frente a un
+    presupuesto diario y por minuto:
+      - try_acquire() registra la llamada o la rechaza si el presupuesto se agotó
+      - ttl_factor() indica cuánto alargar los TTL de cache: 1 si el consumo
+        va al ritmo del presupuesto, más si al ritmo actual se agotaría antes
+        de terminar el día (hasta QUOTA_MAX_TTL_STRETCH)
+      - metrics() expone el presupuesto restante
+    Los contadores diarios se guardan en memoria (tabla api_usage) y se
+    recuperan al reiniciar.
+    """
+    def __init__(self, budgets):
+        self.budgets = budgets            # {proveedor: (diario, por_minuto)}
+        self._lock = threading.Lock()
+        self._minute = defaultdict(deque)  # proveedor -> timestamps del último minuto
+        self._day = None
+        self._daily = defaultdict(int)     # (proveedor, endpoint) -> llamadas hoy
+        self.rejected = defaultdict(int)   # proveedor -> llamadas rechazadas hoy
+
+    def _roll_day(self, now):
+        """Cambia de día (UTC) si hace falta, cargando lo ya consumido hoy (llamar con el lock)."""
+        day = _utc_day(now)
+        if day == self._day:
+            return
+        self._day = day
+        self._daily = defaultdict(int)
+        self.rejected = defaultdict(int)
+        try:
+            self._daily.update(get_api_usage(day))
+        except Exception as e:
+            logging.error(f"[Cuota] No se pudo cargar el consumo de hoy: {e}")
+
+    def _used_today(self, provider):
+        return sum(calls for (p, _e), calls in self._daily.items() if p == provider)
+
+    def try_acquire(self, provider, endpoint):
+        """Registra una llamada a `provider`/`endpoint`. Devuelve False si no queda presupuesto."""
+        daily_budget, minute_budget = self.budgets.get(provider, (0, 0))
+        now = time.time()
+        with self._lock:
+            self._roll_day(now)
+            window = self._minute[provider]
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if (daily_budget and self._used_today(provider) >= daily_budget) or \
+                    (minute_budget and len(window) >= minute_budget):
+                self.rejected[provider] += 1
+                return False
+            window.append(now)
+            self._daily[(provider, endpoint)] += 1
+            day = self._day
+        try:
+            add_api_usage(day, provider, endpoint)
+        except Exception as e:
+            logging.error(f"[Cuota] No se pudo guardar el consumo: {e}")
+        return True
+
+    def ttl_factor(self, provider):
+        """Factor (≥ 1) por el que alargar los TTL de las caches de `provider`."""
+        daily_budget, _minute_budget = self.budgets.get(provider, (0, 0))
+        if not daily_budget:
+            return 1.0
+        now = time.time()
+        with self._lock:
+            self._roll_day(now)
+            used = self._used_today(provider)
+        remaining = daily_budget - used
+        if remaining <= 0:
+            return QUOTA_MAX_TTL_STRETCH
+        # Consumo proyectado al final del día al ritmo actual frente al presupuesto
+        projected = used / max(_day_fraction(now), MIN_DAY_FRACTION)
+        return min(max(1.0, projected / daily_budget), QUOTA_MAX_TTL_STRETCH)
+
+    def metrics(self):
+        """Presupuesto restante por proveedor: {proveedor: {...}}."""
+        now = time.time()
+        result = {}
+        with self._lock:
+            self._roll_day(now)
+            for provider, (daily_budget, minute_budget) in self.budgets.items():
+                window = self._minute[provider]
+                while window and now - window[0] >= 60:
+                    window.popleft()
+                used = self._used_today(provider)
+                result[provider] = {
+                    "used_today": used,
+                    "daily_budget": daily_budget,
+                    "remaining_today": daily_budget - used if daily_budget else None,
+                    "used_last_minute": len(window),
+                    "minute_budget": minute_budget,
+                    "rejected_today": self.rejected[provider],
+                    "by_endpoint": {e: n for (p, e), n in self._daily.items() if p == provider},
+                }
+        for provider in result:
+            result[provider]["ttl_factor"] = round(self.ttl_factor(provider), 2)
+        return result
+
+# Gestor compartido por todas las caches con proveedor
+QUOTA = QuotaManager({
+    PROVIDER_CMC: (CMC_DAILY_BUDGET, CMC_MINUTE_BUDGET),
+    PROVIDER_COINGECKO: (COINGECKO_DAILY_BUDGET, COINGECKO_MINUTE_BUDGET),
+    PROVIDER_NEWSAPI: (NEWSAPI_DAILY_BUDGET, NEWSAPI_MINUTE_BUDGET),
+})
+
+def log_quota_metrics():
+    """Registra en el log el presupuesto restante de cada proveedor."""
+    for provider, m in QUOTA.metrics().items():
+        logging.info(
+            f"[Cuota] {provider}: {m['used_today']}/{m['daily_budget']} hoy, "
+            f"{m['used_last_minute']}/{m['minute_budget']} último minuto, "
+            f"TTL x{m['ttl_factor']}, rechazadas {m['rejected_today']}"
+        )
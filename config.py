@@ -5,8 +5,75 @@ import os
 # -------------------------------------------------
 TELEGRAM_RATE_LIMIT = int(os.getenv('TELEGRAM_RATE_LIMIT', 30))  # Máximo de mensajes por minuto para Telegram
 OPENAI_RATE_LIMIT = int(os.getenv('OPENAI_RATE_LIMIT', 20))      # Máximo de llamadas por minuto para OpenAI
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv('OPENAI_TOKENS_PER_MINUTE', 40000))  # Máximo de tokens (prompt + respuesta) por minuto para OpenAI
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', 4))  # Llamadas simultáneas a OpenAI
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 4))  # Reintentos ante 429/5xx de OpenAI
+OPENAI_REQUEST_TIMEOUT = float(os.getenv('OPENAI_REQUEST_TIMEOUT', 60))  # Tiempo máximo (segundos) por petición HTTP a OpenAI
+OPENAI_FIRST_TOKEN_DEADLINE = float(os.getenv('OPENAI_FIRST_TOKEN_DEADLINE', 30))  # Tiempo máximo (segundos) hasta el primer token de una respuesta interactiva
+OPENAI_HEDGE_ENABLED = os.getenv('OPENAI_HEDGE_ENABLED', 'true').lower() in ('1', 'true', 'yes')  # Lanzar un segundo intento si el primero tarda
+OPENAI_HEDGE_AFTER = float(os.getenv('OPENAI_HEDGE_AFTER', 8))  # Segundos sin primer token antes de lanzar el intento de cobertura
+OPENAI_HEDGE_MODEL = os.getenv('OPENAI_HEDGE_MODEL', 'gpt-3.5-turbo')  # Modelo (igual o más rápido) para el intento de cobertura
+OPENAI_DEEP_MODEL = os.getenv('OPENAI_DEEP_MODEL', 'gpt-4')  # Modelo para análisis completos
+OPENAI_FAST_MODEL = os.getenv('OPENAI_FAST_MODEL', 'gpt-3.5-turbo')  # Modelo rápido y barato para consultas simples
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 1800))  # Tokens máximos del prompt (system + usuario) enviado a GPT
+PROMPT_MEMORY_MESSAGES = int(os.getenv('PROMPT_MEMORY_MESSAGES', 20))  # Mensajes recientes de memoria revisados para dar contexto
+QUESTION_BATCHING = os.getenv('QUESTION_BATCHING', 'false').lower() in ('1', 'true', 'yes')  # Agrupar preguntas simultáneas en una sola petición a GPT
+QUESTION_BATCH_WINDOW = float(os.getenv('QUESTION_BATCH_WINDOW', 1.5))  # Segundos que se espera para reunir preguntas en un lote
+TELEGRAM_MAX_CONCURRENT_UPDATES = int(os.getenv('TELEGRAM_MAX_CONCURRENT_UPDATES', 5))  # Mensajes de Telegram atendidos a la vez (semáforo de process_updates)
+# Cada pregunta de un lote ocupa uno de los TELEGRAM_MAX_CONCURRENT_UPDATES hilos mientras
+# espera, así que un lote nunca puede tener más preguntas que mensajes en paralelo
+QUESTION_BATCH_MAX = min(int(os.getenv('QUESTION_BATCH_MAX', TELEGRAM_MAX_CONCURRENT_UPDATES)), TELEGRAM_MAX_CONCURRENT_UPDATES)  # Máximo de preguntas por lote
 CACHING_INTERVAL_INDICATORS = int(os.getenv('CACHING_INTERVAL_INDICATORS', 10))  # Intervalo (segundos) para actualizar indicadores
-CACHING_INTERVAL_DOMINANCE = int(os.getenv('CACHING_INTERVAL_DOMINANCE', 300))  # Intervalo (segundos) para actualizar la dominancia de BTC
+CACHING_INTERVAL_DOMINANCE = int(os.getenv('CACHING_INTERVAL_DOMINANCE', 900))  # Intervalo (segundos) para consultar las métricas globales de CMC (dominancias, capitalización total); ver CMC_DAILY_BUDGET
+SNAPSHOT_REFRESH_INTERVAL = int(os.getenv('SNAPSHOT_REFRESH_INTERVAL', 60))  # Intervalo (segundos) para refrescar la foto compartida de mercado
+CONTEXT_DEADLINE_SECONDS = float(os.getenv('CONTEXT_DEADLINE_SECONDS', 4))  # Tiempo máximo (segundos) para reunir el contexto de una consulta a GPT
+OPENAI_STREAMING = os.getenv('OPENAI_STREAMING', 'true').lower() in ('1', 'true', 'yes')  # Mostrar las respuestas de GPT a medida que se generan
+TELEGRAM_EDIT_INTERVAL = float(os.getenv('TELEGRAM_EDIT_INTERVAL', 3))  # Segundos mínimos entre ediciones del mensaje en streaming
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 300))  # Segundos que una respuesta de GPT se reutiliza para preguntas equivalentes
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', 256))  # Máximo de respuestas guardadas (LRU)
+ANSWER_CACHE_PRICE_BAND = float(os.getenv('ANSWER_CACHE_PRICE_BAND', 250))  # Ancho (USD) de la banda de precio usada en la clave del cache
+CHART_FILE_ID_MAX_AGE = int(os.getenv('CHART_FILE_ID_MAX_AGE', 300))  # Antigüedad máxima (segundos) para reenviar un gráfico por file_id dentro de la misma vela
+PHOTO_FILE_ID_CACHE_SIZE = int(os.getenv('PHOTO_FILE_ID_CACHE_SIZE', 32))  # Máximo de file_id de fotos guardados (LRU)
+ONCHAIN_TTL_CMC_QUOTES = int(os.getenv('ONCHAIN_TTL_CMC_QUOTES', 900))  # Segundos de validez de marketcap/volumen de BTC (CMC quotes); ver CMC_DAILY_BUDGET
+ONCHAIN_TTL_HASHRATE = int(os.getenv('ONCHAIN_TTL_HASHRATE', 3600))  # Segundos de validez del hashrate (Blockchain.info)
+ONCHAIN_TTL_COINGECKO = int(os.getenv('ONCHAIN_TTL_COINGECKO', 600))  # Segundos de validez de high/low 24h, ATH y supply (CoinGecko)
+ONCHAIN_FETCH_DEADLINE = float(os.getenv('ONCHAIN_FETCH_DEADLINE', 10))  # Tiempo máximo (segundos) esperando a las fuentes on-chain caducadas
+SWR_MAX_STALE_FACTOR = float(os.getenv('SWR_MAX_STALE_FACTOR', 10))  # Un dato cacheado se sirve mientras se refresca hasta TTL × este factor
+OHLCV_MAX_STALE = int(os.getenv('OHLCV_MAX_STALE', 60))  # Antigüedad máxima (segundos) de velas servidas mientras se refrescan
+MEMORY_DB = os.getenv('MEMORY_DB', 'higgs_memory.db')  # Fichero SQLite de memoria (mensajes, tareas, cuotas, traducciones)
+NEWS_DB = os.getenv('NEWS_DB', 'higgs_news.db')  # Fichero SQLite con los artículos ingeridos de NewsAPI
+# Llamadas diarias a NewsAPI: una página cada 86400/1800 = 48 ingestas → 48 llamadas, por debajo
+# de las 100 del plan gratuito (margen para reinicios, ingestas a demanda y páginas extra
+# cuando una ingesta queda incompleta). Si se baja el intervalo o se suben las páginas,
+# comprobar que 86400 / NEWS_INGEST_INTERVAL * NEWS_INGEST_MAX_PAGES < NEWSAPI_DAILY_BUDGET.
+NEWS_INGEST_INTERVAL = int(os.getenv('NEWS_INGEST_INTERVAL', 1800))  # Segundos entre consultas incrementales a NewsAPI; ver NEWSAPI_DAILY_BUDGET
+NEWS_INGEST_MAX_PAGES = int(os.getenv('NEWS_INGEST_MAX_PAGES', 1))  # Páginas (de 100 artículos) como máximo por ingesta; lo que no quepa se lee en la siguiente
+NEWS_RETENTION_DAYS = int(os.getenv('NEWS_RETENTION_DAYS', 30))  # Días que se conservan los artículos ingeridos
+NEWS_DUP_THRESHOLD = float(os.getenv('NEWS_DUP_THRESHOLD', 0.6))  # Similitud (Jaccard estimada de 5-gramas de letras) a partir de la que dos titulares son la misma noticia
+NEWS_RECENCY_HALF_LIFE = int(os.getenv('NEWS_RECENCY_HALF_LIFE', 12 * 3600))  # Segundos en los que la relevancia de un titular se reduce a la mitad
+NEWS_SEARCH_MIN_COVERAGE = float(os.getenv('NEWS_SEARCH_MIN_COVERAGE', 0.6))  # Fracción de palabras del titular que debe contener el mensaje para asociarlo a la noticia
+ARTICLE_CACHE_TTL = int(os.getenv('ARTICLE_CACHE_TTL', 21600))  # Segundos de validez del contenido de artículos en memoria
+ARTICLE_CACHE_MAX_BYTES = int(os.getenv('ARTICLE_CACHE_MAX_BYTES', 20 * 1024 * 1024))  # Tamaño máximo de los cuerpos extraídos y traducidos guardados en disco
+ARTICLE_PREFETCH_WORKERS = int(os.getenv('ARTICLE_PREFETCH_WORKERS', 2))  # Artículos que se descargan a la vez en segundo plano
+HISTORICAL_DOMINANCE_TTL = int(os.getenv('HISTORICAL_DOMINANCE_TTL', 3600))  # Segundos de validez de la dominancia histórica (CMC)
+TOP_MOVERS_TTL = int(os.getenv('TOP_MOVERS_TTL', 300))  # Segundos de validez del top 3 de ganadoras/perdedoras (CoinGecko)
+TRANSLATION_MAX_WORKERS = int(os.getenv('TRANSLATION_MAX_WORKERS', 4))  # Traducciones simultáneas a MyMemory
+TRANSLATION_CHUNK_BYTES = int(os.getenv('TRANSLATION_CHUNK_BYTES', 480))  # Bytes máximos por petición a MyMemory (el API admite 500)
+# Llamadas diarias a CMC sin alargar TTL: quotes 86400/900 = 96 + métricas globales 86400/900 = 96
+# + dominancia histórica 86400/3600 = 24 → 216, por debajo de 330 (margen para reinicios).
+# Si se bajan esos TTL, subir el presupuesto o los TTL se alargarán solos al agotarse.
+CMC_DAILY_BUDGET = int(os.getenv('CMC_DAILY_BUDGET', 330))  # Llamadas diarias permitidas a CoinMarketCap (plan básico ≈ 10.000 créditos/mes)
+CMC_MINUTE_BUDGET = int(os.getenv('CMC_MINUTE_BUDGET', 30))  # Llamadas por minuto permitidas a CoinMarketCap
+COINGECKO_DAILY_BUDGET = int(os.getenv('COINGECKO_DAILY_BUDGET', 10000))  # Llamadas diarias permitidas a CoinGecko
+COINGECKO_MINUTE_BUDGET = int(os.getenv('COINGECKO_MINUTE_BUDGET', 10))  # Llamadas por minuto permitidas a CoinGecko (plan público)
+NEWSAPI_DAILY_BUDGET = int(os.getenv('NEWSAPI_DAILY_BUDGET', 100))  # Llamadas diarias permitidas a NewsAPI (plan gratuito)
+NEWSAPI_MINUTE_BUDGET = int(os.getenv('NEWSAPI_MINUTE_BUDGET', 0))  # Llamadas por minuto permitidas a NewsAPI (0 = sin límite)
+QUOTA_MAX_TTL_STRETCH = float(os.getenv('QUOTA_MAX_TTL_STRETCH', 12))  # Factor máximo por el que se alargan los TTL cuando se agota el presupuesto
+TIMESERIES_DB = os.getenv('TIMESERIES_DB', 'higgs_timeseries.db')  # Fichero SQLite de la serie temporal on-chain/mercado
+TIMESERIES_RETENTION_RAW = int(os.getenv('TIMESERIES_RETENTION_RAW', 2 * 86400))  # Segundos que se conservan las muestras originales
+TIMESERIES_RETENTION_5M = int(os.getenv('TIMESERIES_RETENTION_5M', 14 * 86400))  # Segundos que se conservan los puntos de 5 minutos
+TIMESERIES_RETENTION_1H = int(os.getenv('TIMESERIES_RETENTION_1H', 180 * 86400))  # Segundos que se conservan los puntos horarios
+TIMESERIES_RETENTION_1D = int(os.getenv('TIMESERIES_RETENTION_1D', 0))  # Segundos que se conservan los puntos diarios (0 = siempre)
 
 # -------------------------------------------------
 # Feature Columns for ML Model (si se requiere)
@@ -60,6 +127,19 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', "")
 # -------------------------------------------------
 NEWS_API_KEY = os.getenv('NEWS_API_KEY', "")
 
+# -------------------------------------------------
+# API Base URLs (sobrescribibles para apuntar a servicios locales de prueba,
+# ver fake_services.py)
+# -------------------------------------------------
+TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org')
+OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
+COINMARKETCAP_API_BASE = os.getenv('COINMARKETCAP_API_BASE', 'https://pro-api.coinmarketcap.com')
+COINGECKO_API_BASE = os.getenv('COINGECKO_API_BASE', 'https://api.coingecko.com/api/v3')
+NEWS_API_BASE = os.getenv('NEWS_API_BASE', 'https://newsapi.org/v2')
+MYMEMORY_API_BASE = os.getenv('MYMEMORY_API_BASE', 'https://api.mymemory.translated.net')
+BLOCKCHAIN_INFO_API_BASE = os.getenv('BLOCKCHAIN_INFO_API_BASE', 'https://api.blockchain.info')
+ALTERNATIVE_ME_BASE = os.getenv('ALTERNATIVE_ME_BASE', 'https://alternative.me')
+
 # -------------------------------------------------
 # Initial Trading Operations Configuration
 # -------------------------------------------------
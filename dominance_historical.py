@@ -1,12 +1,16 @@
 # dominance_historical.py
 
+import time
 import requests
 import logging
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import pytz
 
-from config import COINMARKETCAP_API_KEY
+from config import COINMARKETCAP_API_KEY, COINMARKETCAP_API_BASE, HISTORICAL_DOMINANCE_TTL
+from swr_cache import swr_cached
+from api_quota import PROVIDER_CMC
+from timeseries import TIMESERIES, RES_1D
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,7 +18,41 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M"
 )
 
+def local_dominance_series(days_back: int = 100):
+    """
+    Serie diaria de dominancia (media de cada día UTC) construida con las
+    muestras locales de global_metrics.py guardadas en timeseries.py.
+    Devuelve None si la serie local no cubre todavía los últimos `days_back` días.
+    """
+    since = time.time() - days_back * 86400
+    series = {
+        name: {ts: avg for ts, avg, _min, _max in TIMESERIES.query(metric, since - 86400, resolution=RES_1D)}
+        for name, metric in (("btc", "btc_dominance"), ("eth", "eth_dominance"), ("others", "others_dominance"))
+    }
+    dias = sorted(series["btc"])
+    if not dias or dias[0] > since:
+        return None
+    return {
+        "dates": [datetime.utcfromtimestamp(ts) for ts in dias],
+        "btc": [series["btc"][ts] for ts in dias],
+        "eth": [series["eth"].get(ts, 0.0) for ts in dias],
+        "others": [series["others"].get(ts, 0.0) for ts in dias],
+    }
+
+
 def fetch_historical_dominance(days_back: int = 100):
+    """
+    Dominancia de BTC, ETH y Others de los últimos `days_back` días.
+    Si la serie local de métricas globales ya cubre el periodo, no se llama a CMC;
+    si no, se usa fetch_cmc_historical_dominance (cacheada).
+    """
+    return local_dominance_series(days_back) or fetch_cmc_historical_dominance(days_back)
+
+
+@swr_cached("cmc_dominancia_historica", ttl=HISTORICAL_DOMINANCE_TTL,
+            is_valid=lambda series: bool(series.get("dates")), provider=PROVIDER_CMC,
+            default={"dates": [], "btc": [], "eth": [], "others": []})
+def fetch_cmc_historical_dominance(days_back: int = 100):
     """
     Llama a CoinMarketCap /v1/global-metrics/quotes/historical para
     obtener la dominancia de BTC, ETH y Others durante los últimos `days_back` días.
@@ -27,7 +65,7 @@ def fetch_historical_dominance(days_back: int = 100):
       }
     Si ocurre un error (403, 401, etc.), imprime un mensaje y devuelve listas vacías.
     """
-    url = "https://pro-api.coinmarketcap.com/v1/global-metrics/quotes/historical"
+    url = f"{COINMARKETCAP_API_BASE}/v1/global-metrics/quotes/historical"
     headers = {
         "Accepts": "application/json",
         "X-CMC_PRO_API_KEY": COINMARKETCAP_API_KEY
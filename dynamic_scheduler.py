@@ -3,8 +3,9 @@ import time
 import datetime
 import threading
 import logging
-import openai
-from telegram_handler import send_telegram_message
+from config import OPENAI_STREAMING
+from telegram_handler import send_telegram_message, stream_completion_to_telegram
+from openai_scheduler import chat_completion, PRIORITY_SCHEDULED
 from memoria import get_pending_tasks, update_task_status
 
 # Configuración de logging para depuración
@@ -26,18 +27,31 @@ def execute_task(task):
     )
     context = prompt
 
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": context}
+    ]
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": context}
-            ],
-            max_tokens=500,
-            temperature=0.7,
-        )
-        answer = response.choices[0].message.content.strip()
-        send_telegram_message(f"[Tarea Programada]\n{answer}")
+        if OPENAI_STREAMING:
+            chunks = chat_completion(
+                messages,
+                model="gpt-4",
+                priority=PRIORITY_SCHEDULED,
+                max_tokens=500,
+                temperature=0.7,
+                stream=True,
+            )
+            stream_completion_to_telegram(chunks, prefix="[Tarea Programada]\n")
+        else:
+            response = chat_completion(
+                messages,
+                model="gpt-4",
+                priority=PRIORITY_SCHEDULED,
+                max_tokens=500,
+                temperature=0.7,
+            )
+            answer = response.choices[0].message.content.strip()
+            send_telegram_message(f"[Tarea Programada]\n{answer}")
         logging.info(f"Tarea ID {task_id} ejecutada correctamente.")
         update_task_status(task_id, 'completed')
     except Exception as e:
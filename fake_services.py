@@ -0,0 +1,467 @@
+# fake_services.py
+#
+# Servicios locales que imitan los endpoints externos que usa el bot
+# (Telegram, OpenAI, CoinMarketCap, CoinGecko, NewsAPI, MyMemory,
+# Blockchain.info y alternative.me) para poder perfilar y hacer pruebas
+# de carga sin gastar cuotas. Cada servicio tiene latencia, tasa de
+# errores 5xx y tasa de 429 configurables. Las velas OHLCV (ccxt/Coinbase,
+# que no se puede redirigir por URL) las sustituye SyntheticExchange.
+#
+# Uso:
+#   python fake_services.py --port 8765 --latency 0.2 --rate-limit-rate 0.02
+#   (imprime las variables *_API_BASE que hay que exportar antes de arrancar el bot)
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Prefijo de ruta de cada servicio -> variable de config que lo apunta
+SERVICE_ENV = {
+    "telegram": ("TELEGRAM_API_BASE", ""),
+    "openai": ("OPENAI_API_BASE", "/v1"),
+    "cmc": ("COINMARKETCAP_API_BASE", ""),
+    "coingecko": ("COINGECKO_API_BASE", "/api/v3"),
+    "newsapi": ("NEWS_API_BASE", "/v2"),
+    "mymemory": ("MYMEMORY_API_BASE", ""),
+    "blockchain": ("BLOCKCHAIN_INFO_API_BASE", ""),
+    "alternative": ("ALTERNATIVE_ME_BASE", ""),
+}
+
+# PNG 1x1 para la imagen del Fear & Greed Index
+TINY_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)
+
+FAKE_HEADLINES = [
+    "Bitcoin ETF inflows hit record as traders eye new highs",
+    "Federal Reserve holds interest rate steady, crypto markets react",
+    "Ethereum gas fees drop after network upgrade",
+    "BlackRock expands crypto offering with new fund",
+    "Solana memecoin frenzy cools as volumes fall",
+    "Japan regulators review stablecoin framework",
+    "Bitcoin hashrate reaches all-time high amid miner expansion",
+    "Ripple and XRP rally after court ruling",
+]
+
+# Segundos por vela de los timeframes que piden market.py y PrintGraphic.py
+TIMEFRAME_SECONDS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "4h": 14400, "6h": 21600, "1d": 86400}
+
+class SyntheticExchange:
+    """
+    Sustituto en proceso de ccxt.coinbase() para pruebas sin red:
+    fetch_ohlcv devuelve `limit` velas sintéticas (paseo aleatorio alrededor
+    de `base_price`) alineadas con el timeframe, tras `latency` segundos.
+    La misma vela en curso da siempre las mismas velas.
+    """
+    def __init__(self, base_price=65000.0, latency=0.0, seed=None):
+        self.base_price = base_price
+        self.latency = latency
+        self.seed = seed
+        self.calls = 0
+
+    def fetch_ohlcv(self, symbol, timeframe="1h", since=None, limit=100):
+        self.calls += 1
+        step = TIMEFRAME_SECONDS.get(timeframe, 3600)
+        last = int(time.time() // step * step)
+        rng = random.Random(f"{symbol}:{timeframe}:{last}:{self.seed}")
+        price = self.base_price
+        candles = []
+        for i in range(limit):
+            ts = (last - (limit - 1 - i) * step) * 1000
+            open_ = price
+            close = open_ * (1 + rng.gauss(0, 0.004))
+            high = max(open_, close) * (1 + abs(rng.gauss(0, 0.002)))
+            low = min(open_, close) * (1 - abs(rng.gauss(0, 0.002)))
+            candles.append([ts, open_, high, low, close, rng.uniform(50, 500)])
+            price = close
+        if self.latency:
+            time.sleep(self.latency)
+        return candles
+
+class ServiceProfile:
+    """Comportamiento simulado de un servicio: latencia (s), jitter (s), tasa de 5xx y de 429."""
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0, token_delay=0.01):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.token_delay = token_delay
+
+    def delay(self, rng):
+        return max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+
+class FakeServices:
+    """
+    Servidor HTTP único que atiende todos los servicios simulados bajo
+    un prefijo de ruta (/telegram, /openai/v1, /cmc, ...).
+    Registra los mensajes enviados a Telegram y permite inyectar updates.
+    """
+    def __init__(self, host="127.0.0.1", port=8765, profiles=None, default_profile=None, seed=None):
+        self.host = host
+        self.port = port
+        self.default_profile = default_profile or ServiceProfile()
+        self.profiles = dict(profiles or {})
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.updates = []            # updates pendientes para getUpdates
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.sent = []               # (timestamp, método, payload) enviados a Telegram
+        self.stats = defaultdict(lambda: defaultdict(int))
+        self.price = 65000.0
+        self._server = None
+
+    # ---------- ciclo de vida ----------
+    def start(self):
+        services = self
+
+        class Handler(_FakeHandler):
+            pass
+        Handler.services = services
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def base_urls(self):
+        """Variables de entorno (*_API_BASE) que apuntan a este servidor."""
+        root = f"http://{self.host}:{self.port}"
+        return {env: f"{root}/{name}{suffix}" for name, (env, suffix) in SERVICE_ENV.items()}
+
+    def profile(self, service):
+        return self.profiles.get(service, self.default_profile)
+
+    # ---------- Telegram ----------
+    def push_update(self, text, thread_id, chat_id=-1000000000001, username="agente"):
+        """Encola un mensaje entrante de Telegram; devuelve su update_id."""
+        with self.lock:
+            update_id = self.next_update_id
+            self.next_update_id += 1
+            self.updates.append({
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "message_thread_id": thread_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "supergroup"},
+                    "from": {"id": update_id, "username": username, "first_name": username},
+                    "text": text,
+                },
+            })
+        return update_id
+
+    def pending_updates(self):
+        with self.lock:
+            return len(self.updates)
+
+    def _next_message_id(self):
+        with self.lock:
+            message_id = self.next_message_id
+            self.next_message_id += 1
+            return message_id
+
+    def _record(self, method, payload):
+        with self.lock:
+            self.sent.append((time.time(), method, payload))
+
+    def _walk_price(self):
+        with self.lock:
+            self.price *= 1 + self.rng.uniform(-0.001, 0.001)
+            return self.price
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    services = None
+
+    def log_message(self, format, *args):
+        pass  # silencioso: el bot ya registra lo suyo
+
+    # ---------- utilidades ----------
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_bytes(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        ctype = self.headers.get("Content-Type", "")
+        if "application/json" in ctype and raw:
+            return json.loads(raw)
+        if "multipart/form-data" in ctype:
+            # Solo interesan los campos de texto (chat_id, caption, ...)
+            fields = {}
+            for name, value in re.findall(rb'name="([^"]+)"\r\n\r\n(.*?)\r\n--', raw, re.DOTALL):
+                fields[name.decode()] = value.decode(errors="replace")
+            return fields
+        if raw:
+            return {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+        return {}
+
+    def _inject_failure(self, service):
+        """Aplica latencia y, al azar, devuelve 429 o 5xx. True si ya respondió."""
+        svc = self.services
+        prof = svc.profile(service)
+        time.sleep(prof.delay(svc.rng))
+        roll = svc.rng.random()
+        outcome = "429" if roll < prof.rate_limit_rate else (
+            "5xx" if roll < prof.rate_limit_rate + prof.error_rate else "ok")
+        with svc.lock:
+            svc.stats[service]["requests"] += 1
+            svc.stats[service][outcome] += 1
+        if outcome == "429":
+            if service == "telegram":
+                self._send_json(429, {"ok": False, "error_code": 429,
+                                      "description": "Too Many Requests: retry after 1",
+                                      "parameters": {"retry_after": 1}})
+            elif service == "openai":
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}})
+            else:
+                self._send_json(429, {"status": {"error_code": 429, "error_message": "Too Many Requests"}})
+            return True
+        if outcome == "5xx":
+            if service == "openai":
+                self._send_json(500, {"error": {"message": "Internal error", "type": "server_error"}})
+            else:
+                self._send_json(500, {"ok": False, "error": "Internal error"})
+            return True
+        return False
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/", 1)
+        service, rest = parts[0], (parts[1] if len(parts) > 1 else "")
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = self._read_body() if method == "POST" else {}
+        route = getattr(self, f"_svc_{service}", None)
+        if route is None:
+            self._send_json(404, {"error": f"servicio desconocido: {service}"})
+            return
+        if self._inject_failure(service):
+            return
+        route(rest, params, body)
+
+    # ---------- Telegram ----------
+    def _svc_telegram(self, rest, params, body):
+        svc = self.services
+        method = rest.rsplit("/", 1)[-1]
+        if method == "getUpdates":
+            offset = int(params.get("offset") or body.get("offset") or 0)
+            with svc.lock:
+                svc.updates = [u for u in svc.updates if u["update_id"] >= offset]
+                result = list(svc.updates)
+            self._send_json(200, {"ok": True, "result": result})
+        elif method in ("sendMessage", "sendPhoto"):
+            svc._record(method, body)
+            result = {"message_id": svc._next_message_id(), "date": int(time.time()),
+                      "chat": {"id": body.get("chat_id")}, "text": body.get("text")}
+            if method == "sendPhoto":
+                result["photo"] = [{"file_id": f"fake-file-{result['message_id']}", "width": 1280, "height": 720}]
+            self._send_json(200, {"ok": True, "result": result})
+        elif method == "editMessageText":
+            svc._record(method, body)
+            self._send_json(200, {"ok": True, "result": {"message_id": body.get("message_id"),
+                                                         "text": body.get("text")}})
+        else:
+            self._send_json(404, {"ok": False, "description": f"Método no soportado: {method}"})
+
+    # ---------- OpenAI ----------
+    def _svc_openai(self, rest, params, body):
+        if not rest.endswith("chat/completions"):
+            self._send_json(404, {"error": {"message": "endpoint no soportado"}})
+            return
+        prompt = (body.get("messages") or [{}])[-1].get("content", "")
+        model = body.get("model", "gpt-4")
+        if "Devuelve SOLO un JSON" in prompt:
+            users = re.findall(r"^(\d+)\. @(\w+):", prompt, re.MULTILINE)
+            content = json.dumps({"respuestas": [
+                {"id": int(i), "respuesta": f"@{u} Lectura simulada del mercado. — Higgs X"} for i, u in users
+            ]}, ensure_ascii=False)
+        else:
+            mention = re.search(r"@(\w+)", prompt)
+            user = f"@{mention.group(1)} " if mention else ""
+            content = (f"{user}Análisis simulado: BTC lateral con sesgo alcista, RSI neutral "
+                       f"y volumen moderado. Vigilen soportes. — Higgs X")
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        created = int(time.time())
+
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": f"chatcmpl-fake-{created}", "object": "chat.completion", "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        token_delay = self.services.profile("openai").token_delay
+        for word in re.findall(r"\S+\s*", content):
+            chunk = {"id": f"chatcmpl-fake-{created}", "object": "chat.completion.chunk",
+                     "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    # ---------- CoinMarketCap ----------
+    def _svc_cmc(self, rest, params, body):
+        price = self.services._walk_price()
+        if rest.endswith("cryptocurrency/quotes/latest"):
+            symbol = params.get("symbol", "BTC")
+            self._send_json(200, {"data": {symbol: {"symbol": symbol, "quote": {"USD": {
+                "price": price, "market_cap": price * 19_700_000, "volume_24h": 31_000_000_000.0,
+            }}}}})
+        elif rest.endswith("global-metrics/quotes/latest"):
+            self._send_json(200, {"data": {
+                "btc_dominance": 54.2, "eth_dominance": 17.1,
+                "quote": {"USD": {"total_market_cap": 2.4e12, "total_volume_24h": 9.5e10}},
+            }})
+        elif rest.endswith("global-metrics/quotes/historical"):
+            now = int(time.time())
+            quotes = [{
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(now - d * 86400)),
+                "quote": {"USD": {"btc_dominance": 54.0 + d * 0.01, "eth_dominance": 17.0,
+                                  "other_dominance": 29.0 - d * 0.01}},
+            } for d in range(100, 0, -1)]
+            self._send_json(200, {"data": {"quotes": quotes}})
+        else:
+            self._send_json(404, {"status": {"error_message": "endpoint no soportado"}})
+
+    # ---------- CoinGecko ----------
+    def _svc_coingecko(self, rest, params, body):
+        price = self.services._walk_price()
+        if rest.endswith("coins/bitcoin"):
+            self._send_json(200, {"id": "bitcoin", "market_data": {
+                "high_24h": {"usd": price * 1.02}, "low_24h": {"usd": price * 0.98},
+                "ath": {"usd": 73_750.0}, "circulating_supply": 19_700_000.0, "total_supply": 21_000_000.0,
+            }})
+        elif rest.endswith("coins/markets"):
+            rng = self.services.rng
+            coins = [{"id": f"coin{i}", "symbol": f"c{i}", "current_price": rng.uniform(0.1, 100),
+                      "price_change_percentage_24h": rng.uniform(-15, 15)}
+                     for i in range(int(params.get("per_page", 100)))]
+            self._send_json(200, coins)
+        else:
+            self._send_json(404, {"error": "endpoint no soportado"})
+
+    # ---------- NewsAPI ----------
+    def _svc_newsapi(self, rest, params, body):
+        root = f"http://{self.services.host}:{self.services.port}"
+        now = time.time()
+        articles = [{
+            "source": {"name": "Fake News Wire"},
+            "title": title,
+            "description": title,
+            "url": f"{root}/articles/{i}",
+            "publishedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now - i * 1800)),
+            "content": f"{title}. " * 5,
+        } for i, title in enumerate(FAKE_HEADLINES)]
+        query = params.get("q", "")
+        if query.startswith('"') and query.endswith('"'):
+            phrase = query.strip('"').lower()
+            articles = [a for a in articles if phrase in a["title"].lower()]
+        page_size = int(params.get("pageSize", 100))
+        self._send_json(200, {"status": "ok", "totalResults": len(articles), "articles": articles[:page_size]})
+
+    def _svc_articles(self, rest, params, body):
+        try:
+            title = FAKE_HEADLINES[int(rest)]
+        except (ValueError, IndexError):
+            self._send_json(404, {"error": "artículo no encontrado"})
+            return
+        paragraphs = "".join(f"<p>{title}. Párrafo simulado número {n} con detalles del mercado.</p>"
+                             for n in range(1, 8))
+        html = f"<html><head><title>{title}</title></head><body><article><h1>{title}</h1>{paragraphs}</article></body></html>"
+        self._send_bytes(200, html.encode(), "text/html; charset=utf-8")
+
+    # ---------- MyMemory ----------
+    def _svc_mymemory(self, rest, params, body):
+        text = params.get("q", "")
+        pair = params.get("langpair", "en|es")
+        self._send_json(200, {"responseData": {"translatedText": f"[{pair.split('|')[-1]}] {text}",
+                                               "match": 1}, "responseStatus": 200})
+
+    # ---------- Blockchain.info ----------
+    def _svc_blockchain(self, rest, params, body):
+        now = int(time.time())
+        self._send_json(200, {"status": "ok", "values": [
+            {"x": now - d * 86400, "y": 6.1e8 + d * 1e6} for d in range(7, 0, -1)
+        ]})
+
+    # ---------- alternative.me ----------
+    def _svc_alternative(self, rest, params, body):
+        self._send_bytes(200, TINY_PNG, "image/png")
+
+def parse_service_profile(spec):
+    """NOMBRE:LATENCIA[:ERRORES[:429]] -> (nombre, ServiceProfile)."""
+    parts = spec.split(":")
+    values = [float(p) for p in parts[1:]] + [0.0] * (3 - len(parts[1:]))
+    return parts[0], ServiceProfile(latency=values[0], error_rate=values[1], rate_limit_rate=values[2])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicios externos simulados para HiggsX")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="latencia base (s) de todos los servicios")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variación aleatoria (s) de la latencia")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas 5xx")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fracción de respuestas 429")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="segundos entre tokens del stream de OpenAI")
+    parser.add_argument("--service", action="append", default=[],
+                        help="perfil por servicio: NOMBRE:LATENCIA[:ERRORES[:429]] (p. ej. openai:2.0:0.01:0.05)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    default = ServiceProfile(args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.token_delay)
+    profiles = dict(parse_service_profile(spec) for spec in args.service)
+    services = FakeServices(args.host, args.port, profiles, default, args.seed).start()
+    print(f"Servicios simulados escuchando en http://{services.host}:{services.port}")
+    for env, url in services.base_urls().items():
+        print(f"export {env}={url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        services.stop()
+        return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# global_metrics.py
+
+import logging
+import requests
+
+from config import COINMARKETCAP_API_KEY, COINMARKETCAP_API_BASE, CACHING_INTERVAL_DOMINANCE
+from timeseries import record_sample
+from swr_cache import SWRCache
+from api_quota import PROVIDER_CMC
+
+CMC_HEADERS = {
+    "X-CMC_PRO_API_KEY": COINMARKETCAP_API_KEY,
+    "Accept": "application/json"
+}
+
+def fetch_cmc_global_metrics_raw() -> dict:
+    """
+    Única llamada a /v1/global-metrics/quotes/latest de CoinMarketCap. Devuelve:
+      - btc_dominance, eth_dominance, others_dominance (%)
+      - total_marketcap_usd, total_volume_24h_usd
+    Campos None si falla. Cada respuesta válida se guarda en la serie local (timeseries.py).
+    """
+    url = f"{COINMARKETCAP_API_BASE}/v1/global-metrics/quotes/latest"
+    params = {"convert": "USD"}
+    metrics = {
+        "btc_dominance": None,
+        "eth_dominance": None,
+        "others_dominance": None,
+        "total_marketcap_usd": None,
+        "total_volume_24h_usd": None,
+    }
+    try:
+        resp = requests.get(url, headers=CMC_HEADERS, params=params, timeout=10)
+        resp.raise_for_status()
+        gm = resp.json().get("data", {})
+        quote_usd = gm.get("quote", {}).get("USD", {})
+        btc, eth = gm.get("btc_dominance"), gm.get("eth_dominance")
+        metrics.update({
+            "btc_dominance": btc,
+            "eth_dominance": eth,
+            "others_dominance": 100 - btc - eth if btc is not None and eth is not None else None,
+            "total_marketcap_usd": quote_usd.get("total_market_cap"),
+            "total_volume_24h_usd": quote_usd.get("total_volume_24h"),
+        })
+    except requests.exceptions.HTTPError as http_err:
+        status = resp.status_code if "resp" in locals() else None
+        if status == 401:
+            logging.error("CMC global metrics Unauthorized (401): verifica tu COINMARKETCAP_API_KEY.")
+        else:
+            logging.error(f"CMC global metrics HTTP {status}: {http_err}")
+        return metrics
+    except Exception as e:
+        logging.error(f"Error al obtener CMC global metrics: {e}")
+        return metrics
+
+    if metrics["btc_dominance"] is not None:
+        record_sample(metrics)
+    return metrics
+
+# Cache compartida: como mucho una llamada a CMC por CACHING_INTERVAL_DOMINANCE
+GLOBAL_METRICS_CACHE = SWRCache(
+    "cmc_global_metrics",
+    fetch_cmc_global_metrics_raw,
+    ttl=CACHING_INTERVAL_DOMINANCE,
+    is_valid=lambda metrics: metrics.get("btc_dominance") is not None,
+    provider=PROVIDER_CMC,
+)
+
+def get_global_metrics(wait=None) -> dict:
+    """Últimas métricas globales (dominancias, capitalización y volumen total) desde la cache."""
+    return GLOBAL_METRICS_CACHE.get(wait=wait) or {}
@@ -7,6 +7,7 @@ import pytz
 
 from market import fetch_data, start_dominance_monitor
 from indicators import calculate_indicators
+from market_snapshot import get_snapshot, start_snapshot_service, format_monitor_message
 from config import SYMBOL, TIMEFRAME
 from telegram_bot import telegram_bot_loop
 from trading_signals import monitor_signals
@@ -33,25 +34,18 @@ class MarketMonitor:
 
         # Iniciar el monitor de dominancia de BTC
         start_dominance_monitor()
+        # Foto compartida de mercado (indicadores + on-chain) para todos los consumidores
+        start_snapshot_service()
 
     async def monitor_market(self):
         while True:
             try:
-                data = fetch_data(SYMBOL, TIMEFRAME)
-                indicadores = calculate_indicators(data)
-                dominance_text = f"{indicadores['btc_dominance']:.2f}%" if indicadores.get('btc_dominance') is not None else "N/D"
-                
-                general_msg = (
-                    f"📊 {SYMBOL}:\n"
-                    f"Precio: ${indicadores['price']:.2f}\n"
-                    f"RSI: {indicadores['rsi']:.2f}\n"
-                    f"MACD: {indicadores['macd']:.2f} (Señal: {indicadores['macd_signal']:.2f})\n"
-                    f"ADX: {indicadores['adx']:.2f}\n"
-                    f"SMA: {indicadores['sma_10']:.2f} / {indicadores['sma_25']:.2f} / {indicadores['sma_50']:.2f}\n"
-                    f"Volumen: {indicadores['volume_level']} (CMF: {indicadores['cmf']:.2f})\n"
-                    f"Bandas de Bollinger: Low ${indicadores['bb_low']:.2f}, Med ${indicadores['bb_medium']:.2f}, High ${indicadores['bb_high']:.2f}\n"
-                    f"BTC Dominancia: {dominance_text}"
-                )
+                snap = get_snapshot()
+                if snap is not None:
+                    general_msg = snap.monitor_text
+                else:
+                    data = fetch_data(SYMBOL, TIMEFRAME)
+                    general_msg = format_monitor_message(calculate_indicators(data))
                 logging.info(general_msg)  # Mostrar en log
 
                 # Enviar mensaje a Telegram de forma asíncrona
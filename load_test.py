@@ -0,0 +1,289 @@
+# load_test.py
+#
+# Prueba de carga del bot de Telegram contra los servicios simulados
+# (fake_services.py). Genera un flujo de updates (preguntas, peticiones de
+# gráfico y tareas "Programa") a un ritmo configurable, deja que el bucle
+# real process_updates/handle_telegram_message los atienda y mide:
+#   - throughput de respuestas
+#   - percentiles de latencia de respuesta (desde que el update entra en la cola)
+#   - profundidad de colas (updates sin leer, respuestas pendientes, cola de OpenAI)
+#   - errores (sin respuesta, mensajes de error, 429/5xx de los servicios)
+#
+# Uso:
+#   python load_test.py --rate 2 --duration 60 --concurrency 5
+#   python load_test.py --rate 5 --duration 120 --service openai:3.0 --json resultado.json --max-p95 30
+#
+# Las velas OHLCV (indicadores y gráficos) salen de SyntheticExchange en vez
+# de Coinbase, así que la prueba no necesita red; su latencia se fija con
+# --service exchange:LATENCIA.
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+
+from fake_services import FakeServices, ServiceProfile, SyntheticExchange, parse_service_profile
+
+# Mezcla por defecto de mensajes (peso relativo de cada tipo)
+DEFAULT_MIX = {"pregunta": 0.7, "grafico": 0.15, "programa": 0.15}
+
+QUESTION_SCRIPTS = [
+    "Hola Higgs",
+    "¿A cuánto está BTC?",
+    "¿Qué tal el volumen hoy?",
+    "¿Cómo ves BTC para esta semana?",
+    "Haz un análisis de la tendencia y los soportes",
+    "¿Qué noticias hay sobre el ETF de Bitcoin?",
+    "¿Debería esperar para la entrada o conviene comprar ya?",
+]
+CHART_SCRIPTS = ["gráfico 1h", "gráfico de velas 4h", "grafico 1d", "gráfico velas japonesas 15m"]
+TASK_SCRIPT = "Programa: revisar el mercado para {user} en {mins} minutos"
+
+def percentile(values, pct):
+    """Percentil por interpolación lineal (values sin ordenar)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+class LoadTest:
+    def __init__(self, services, rate, duration, mix=None, drain=60, sample_interval=1.0, seed=None):
+        self.services = services
+        self.rate = rate
+        self.duration = duration
+        self.mix = mix or DEFAULT_MIX
+        self.drain = drain
+        self.sample_interval = sample_interval
+        self.rng = random.Random(seed)
+        self.requests = []      # dict(seq, kind, user, text, sent_at)
+        self.samples = []       # dict(t, telegram_pendientes, en_vuelo, openai_en_cola, openai_activas)
+        self._stop_sampling = threading.Event()
+
+    # ---------- generación ----------
+    def _script(self, seq):
+        kind = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        user = f"carga{seq}"   # usuario único: las respuestas lo mencionan y así se emparejan
+        if kind == "pregunta":
+            text = self.rng.choice(QUESTION_SCRIPTS)
+        elif kind == "grafico":
+            text = self.rng.choice(CHART_SCRIPTS)
+        else:
+            text = TASK_SCRIPT.format(user=user, mins=self.rng.randint(5, 60))
+        return kind, user, text
+
+    def generate(self, thread_id, chat_id):
+        """Inyecta updates con llegadas de Poisson a `rate` mensajes por segundo."""
+        end = time.time() + self.duration
+        seq = 0
+        while time.time() < end:
+            seq += 1
+            kind, user, text = self._script(seq)
+            self.services.push_update(text, thread_id, chat_id=chat_id, username=user)
+            self.requests.append({"seq": seq, "kind": kind, "user": user, "text": text, "sent_at": time.time()})
+            time.sleep(self.rng.expovariate(self.rate))
+
+    # ---------- observación ----------
+    def _answered(self):
+        return len(self.match_replies()[0])
+
+    def sample_loop(self):
+        from openai_scheduler import OPENAI_SCHEDULER
+        start = time.time()
+        while not self._stop_sampling.wait(self.sample_interval):
+            self.samples.append({
+                "t": round(time.time() - start, 1),
+                "telegram_pendientes": self.services.pending_updates(),
+                "en_vuelo": len(self.requests) - self._answered(),
+                "openai_en_cola": len(OPENAI_SCHEDULER._waiting),
+                "openai_activas": OPENAI_SCHEDULER._active,
+            })
+
+    def match_replies(self):
+        """
+        Empareja cada petición con la primera salida visible en Telegram:
+          - preguntas y tareas: primer sendMessage/edición que menciona al usuario
+          - gráficos: sendPhoto en orden de llegada
+        Devuelve ({seq: latencia}, [textos de error]).
+        """
+        with self.services.lock:
+            sent = list(self.services.sent)
+        by_user = {r["user"]: r for r in self.requests if r["kind"] != "grafico"}
+        charts = [r for r in self.requests if r["kind"] == "grafico"]
+        latencies = {}
+        errors = []
+        chart_idx = 0
+        for ts, method, payload in sent:
+            if method == "sendPhoto":
+                if chart_idx < len(charts):
+                    req = charts[chart_idx]
+                    latencies[req["seq"]] = ts - req["sent_at"]
+                    chart_idx += 1
+                continue
+            text = str(payload.get("text") or "")
+            if "Error" in text or "error" in text:
+                errors.append(text[:120])
+            for user in re.findall(r"carga\d+", text):
+                req = by_user.get(user)
+                if req and req["seq"] not in latencies:
+                    latencies[req["seq"]] = ts - req["sent_at"]
+        return latencies, errors
+
+    # ---------- ejecución ----------
+    def run(self, thread_id, chat_id):
+        sampler = threading.Thread(target=self.sample_loop, daemon=True)
+        sampler.start()
+        started = time.time()
+        self.generate(thread_id, chat_id)
+        generated_at = time.time()
+        # Drenaje: esperar a que se respondan las peticiones pendientes
+        while time.time() - generated_at < self.drain and self._answered() < len(self.requests):
+            time.sleep(self.sample_interval)
+        self._stop_sampling.set()
+        return self.report(time.time() - started)
+
+    def report(self, elapsed):
+        latencies, errors = self.match_replies()
+        by_kind = {}
+        for req in self.requests:
+            stats = by_kind.setdefault(req["kind"], {"enviadas": 0, "respondidas": 0, "latencias": []})
+            stats["enviadas"] += 1
+            if req["seq"] in latencies:
+                stats["respondidas"] += 1
+                stats["latencias"].append(latencies[req["seq"]])
+
+        def summary(values):
+            result = {f"p{p}": percentile(values, p) for p in (50, 90, 95, 99)}
+            result["max"] = max(values) if values else None
+            return result
+
+        all_latencies = list(latencies.values())
+        return {
+            "duracion_s": round(elapsed, 1),
+            "enviadas": len(self.requests),
+            "respondidas": len(latencies),
+            "sin_respuesta": len(self.requests) - len(latencies),
+            "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+            "latencia_s": summary(all_latencies),
+            "por_tipo": {k: {"enviadas": v["enviadas"], "respondidas": v["respondidas"],
+                             "latencia_s": summary(v["latencias"])} for k, v in by_kind.items()},
+            "colas": {name: {"max": max((s[name] for s in self.samples), default=0),
+                             "media": round(sum(s[name] for s in self.samples) / len(self.samples), 2)
+                             if self.samples else 0}
+                      for name in ("telegram_pendientes", "en_vuelo", "openai_en_cola", "openai_activas")},
+            "mensajes_error": len(errors),
+            "ejemplos_error": errors[:5],
+            "servicios": {svc: dict(counts) for svc, counts in self.services.stats.items()},
+        }
+
+def print_report(result):
+    def fmt(v):
+        return f"{v:6.2f}s" if isinstance(v, (int, float)) else "   N/D "
+
+    print("\n========== Resultado de la prueba de carga ==========")
+    print(f"Duración: {result['duracion_s']}s | Enviadas: {result['enviadas']} | "
+          f"Respondidas: {result['respondidas']} | Sin respuesta: {result['sin_respuesta']}")
+    print(f"Throughput: {result['throughput_rps']} respuestas/s")
+    lat = result["latencia_s"]
+    print(f"Latencia total   p50 {fmt(lat['p50'])}  p90 {fmt(lat['p90'])}  p95 {fmt(lat['p95'])}  "
+          f"p99 {fmt(lat['p99'])}  max {fmt(lat['max'])}")
+    for kind, stats in result["por_tipo"].items():
+        lat = stats["latencia_s"]
+        print(f"  {kind:<10} {stats['respondidas']:>4}/{stats['enviadas']:<4} "
+              f"p50 {fmt(lat['p50'])}  p95 {fmt(lat['p95'])}  max {fmt(lat['max'])}")
+    print("Colas (máx / media):")
+    for name, stats in result["colas"].items():
+        print(f"  {name:<20} {stats['max']:>5} / {stats['media']}")
+    print(f"Mensajes de error enviados: {result['mensajes_error']}")
+    for ejemplo in result["ejemplos_error"]:
+        print(f"  - {ejemplo}")
+    print("Servicios simulados:")
+    for svc, counts in sorted(result["servicios"].items()):
+        print(f"  {svc:<12} " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del bot de Telegram de HiggsX")
+    parser.add_argument("--rate", type=float, default=1.0, help="mensajes entrantes por segundo")
+    parser.add_argument("--duration", type=float, default=60, help="segundos generando mensajes")
+    parser.add_argument("--drain", type=float, default=60, help="segundos máximos esperando respuestas al final")
+    parser.add_argument("--concurrency", type=int, default=5,
+                        help="updates atendidos en paralelo (semáforo de process_updates)")
+    parser.add_argument("--mix", default=None,
+                        help="pesos pregunta,grafico,programa (p. ej. 0.8,0.1,0.1)")
+    parser.add_argument("--port", type=int, default=0, help="puerto de los servicios simulados (0 = libre)")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--service", action="append", default=[],
+                        help="perfil por servicio: NOMBRE:LATENCIA[:ERRORES[:429]] (exchange = velas OHLCV)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", default=None, help="guardar el resultado en este fichero")
+    parser.add_argument("--max-p95", type=float, default=None,
+                        help="falla (código 1) si la latencia p95 supera estos segundos")
+    args = parser.parse_args(argv)
+
+    default = ServiceProfile(args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.token_delay)
+    profiles = dict(parse_service_profile(spec) for spec in args.service)
+    exchange_profile = profiles.pop("exchange", default)
+    services = FakeServices(port=args.port, profiles=profiles, default_profile=default, seed=args.seed).start()
+
+    # El bot lee las URLs base y los ficheros SQLite de config al importarse:
+    # hay que fijarlos antes (bases temporales para no tocar las reales)
+    os.environ.update(services.base_urls())
+    db_dir = tempfile.mkdtemp(prefix="higgs_carga_")
+    os.environ["MEMORY_DB"] = os.path.join(db_dir, "memoria.db")
+    os.environ["NEWS_DB"] = os.path.join(db_dir, "noticias.db")
+    os.environ["TIMESERIES_DB"] = os.path.join(db_dir, "series.db")
+    os.environ.setdefault("TELEGRAM_TOKEN", "carga")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-carga")
+    os.environ.setdefault("NEWS_API_KEY", "carga")
+    os.environ.setdefault("COINMARKETCAP_API_KEY", "carga")
+
+    # Velas sintéticas en lugar de Coinbase para indicadores y gráficos
+    import market
+    import PrintGraphic
+    exchange = SyntheticExchange(latency=exchange_profile.latency, seed=args.seed)
+    market.exchange = exchange
+    PrintGraphic.exchange = exchange
+
+    from config import TELEGRAM_CHAT_ID, TELEGRAM_HIGGS_THREAD_ID
+    from telegram_bot import process_updates
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(process_updates(asyncio.Semaphore(args.concurrency)), loop)
+
+    mix = DEFAULT_MIX
+    if args.mix:
+        mix = dict(zip(DEFAULT_MIX, (float(w) for w in args.mix.split(","))))
+
+    print(f"[Carga] {args.rate} msg/s durante {args.duration}s contra http://{services.host}:{services.port}")
+    test = LoadTest(services, args.rate, args.duration, mix=mix, drain=args.drain, seed=args.seed)
+    result = test.run(TELEGRAM_HIGGS_THREAD_ID, int(TELEGRAM_CHAT_ID))
+    result["servicios"]["exchange"] = {"requests": exchange.calls}
+    print_report(result)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"[Carga] Resultado guardado en {args.json_path}")
+
+    services.stop()
+    p95 = result["latencia_s"]["p95"]
+    if args.max_p95 is not None and (p95 is None or p95 > args.max_p95):
+        print(f"[Carga] p95 {p95} supera el máximo de {args.max_p95}s")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,15 +3,17 @@
 import ccxt
 import time
 import pandas as pd
-import requests
 import threading
 from config import (
     SYMBOL,
     TIMEFRAME,
     MAX_RETRIES,
+    CACHING_INTERVAL_INDICATORS,
     CACHING_INTERVAL_DOMINANCE,
-    COINMARKETCAP_API_KEY,
+    OHLCV_MAX_STALE,
 )
+from swr_cache import SWRCache
+from global_metrics import GLOBAL_METRICS_CACHE
 
 exchange = ccxt.coinbase()
 
@@ -19,7 +21,27 @@ exchange = ccxt.coinbase()
 BTC_DOMINANCE = None
 BTC_DOMINANCE_TIMESTAMP = 0
 
-def fetch_data(symbol=SYMBOL, timeframe=TIMEFRAME, limit=100):
+# Duración de cada vela en segundos (para saber si un dato o gráfico sigue vigente)
+TIMEFRAME_SECONDS = {
+    "1m":  60,
+    "5m":  300,
+    "15m": 900,
+    "1h":  3600,
+    "6h":  21600,
+    "1d":  86400,
+}
+
+def current_candle_start(timeframe: str, now: float = None) -> int:
+    """
+    Devuelve el timestamp (segundos UTC) de apertura de la vela en curso
+    para `timeframe`. Sirve para identificar si un gráfico ya enviado sigue vigente.
+    """
+    if now is None:
+        now = time.time()
+    step = TIMEFRAME_SECONDS.get(timeframe, 3600)
+    return int(now // step) * step
+
+def _fetch_ohlcv(symbol, timeframe, limit):
     """
     Obtiene datos OHLCV con manejo de errores y retrasos mínimos.
     """
@@ -36,52 +58,37 @@ def fetch_data(symbol=SYMBOL, timeframe=TIMEFRAME, limit=100):
             retries += 1
     raise Exception("No se pudieron obtener datos tras varios intentos.")
 
+# Velas por (símbolo, timeframe, límite); se sirven como mucho OHLCV_MAX_STALE segundos viejas
+_OHLCV_CACHE = SWRCache("ohlcv", _fetch_ohlcv, ttl=CACHING_INTERVAL_INDICATORS, max_stale=OHLCV_MAX_STALE)
+
+def fetch_data(symbol=SYMBOL, timeframe=TIMEFRAME, limit=100):
+    """
+    Devuelve las velas OHLCV desde cache (stale-while-revalidate).
+    Cada llamador recibe su propia copia del DataFrame.
+    """
+    df = _OHLCV_CACHE.get(symbol, timeframe, limit)
+    if df is None:
+        raise Exception("No se pudieron obtener datos tras varios intentos.")
+    return df.copy()
+
 def fetch_btc_dominance():
     """
-    Obtiene la dominancia de BTC utilizando la API de CoinMarketCap.
-    Se cachea durante CACHING_INTERVAL_DOMINANCE segundos.
+    Dominancia de BTC desde el servicio único de métricas globales de CMC
+    (global_metrics.py, como mucho una llamada cada CACHING_INTERVAL_DOMINANCE).
+    Actualiza BTC_DOMINANCE / BTC_DOMINANCE_TIMESTAMP con el último valor bueno.
     """
     global BTC_DOMINANCE, BTC_DOMINANCE_TIMESTAMP
-    current_time = time.time()
-
-    # Si la dominancia ya está cacheada y no expiró, retornarla
-    if BTC_DOMINANCE is not None and (current_time - BTC_DOMINANCE_TIMESTAMP) < CACHING_INTERVAL_DOMINANCE:
-        return BTC_DOMINANCE
-    
-
-    url = "https://pro-api.coinmarketcap.com/v1/global-metrics/quotes/latest"
-    headers = {
-        "Accepts": "application/json",
-        "X-CMC_PRO_API_KEY": COINMARKETCAP_API_KEY
-    }
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json().get("data", {})
-        dominance = data.get("btc_dominance")
-
-        if dominance is None:
-            print("Dominancia de BTC no encontrada en la respuesta de CoinMarketCap.")
-        else:
-            BTC_DOMINANCE = dominance
-            BTC_DOMINANCE_TIMESTAMP = current_time
-
-        return dominance
-
-    except requests.exceptions.HTTPError as http_err:
-        status = response.status_code if 'response' in locals() else None
-        if status == 401:
-            print("[Error fetch_btc_dominance] Unauthorized: verifica tu COINMARKETCAP_API_KEY.")
-        else:
-            print(f"[Error fetch_btc_dominance] HTTP error al obtener dominancia de BTC: {http_err}")
-        return None
-    except Exception as e:
-        print(f"[Error fetch_btc_dominance] Excepción al obtener dominancia de BTC: {e}")
-        return None
+    result = GLOBAL_METRICS_CACHE.lookup()
+    dominance = (result.value or {}).get("btc_dominance")
+    if dominance is not None and result.age is not None:
+        BTC_DOMINANCE = dominance
+        BTC_DOMINANCE_TIMESTAMP = time.time() - result.age
+    return dominance
 
 def update_btc_dominance_loop():
     """
     Hilo que actualiza BTC_DOMINANCE cada CACHING_INTERVAL_DOMINANCE segundos.
+    Es el que marca la cadencia de consulta de las métricas globales de CMC.
     """
     while True:
         dominance = fetch_btc_dominance()
@@ -0,0 +1,159 @@
+# market_snapshot.py
+
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from config import SYMBOL, TIMEFRAME, SNAPSHOT_REFRESH_INTERVAL
+from market import fetch_data
+from indicators import calculate_indicators
+from onchain import fetch_onchain_stats
+from swr_cache import log_cache_health
+from api_quota import log_quota_metrics
+from timeseries import record_sample, trend_context
+
+# Funciones auxiliares de formateo (None → "N/D")
+def fmt_usd(val):
+    return f"${val:,.0f}" if isinstance(val, (int, float)) else "N/D"
+def fmt_usd_dec(val):
+    return f"${val:,.2f}" if isinstance(val, (int, float)) else "N/D"
+def fmt_num(val, suffix=""):
+    return f"{val:,.0f}{suffix}" if isinstance(val, (int, float)) else "N/D"
+def fmt_dec(val):
+    return f"{val:.2f}" if isinstance(val, (int, float)) else "N/D"
+def fmt_pct(val):
+    return f"{val:.2f}%" if isinstance(val, (int, float)) else "N/D"
+
+def format_indicators_block(ind):
+    """Bloque de indicadores técnicos para el prompt."""
+    return (
+        f"🔍 Indicadores de {SYMBOL}:\n"
+        f"- Precio: ${fmt_dec(ind.get('price'))}\n"
+        f"- RSI: {fmt_dec(ind.get('rsi'))}\n"
+        f"- MACD: {fmt_dec(ind.get('macd'))} (Señal {fmt_dec(ind.get('macd_signal'))})\n"
+        f"- SMA: {fmt_dec(ind.get('sma_10'))}|{fmt_dec(ind.get('sma_25'))}|{fmt_dec(ind.get('sma_50'))}\n"
+        f"- Volumen (nivel): {ind.get('volume_level','N/D')} (CMF: {fmt_dec(ind.get('cmf'))})\n"
+    )
+
+def format_onchain_block(onchain, ind):
+    """Bloque de datos on-chain para el prompt (con tendencias de la serie local si las hay)."""
+    hr = onchain.get("hashrate")
+    block = (
+        f"🧮 Datos on-chain actuales:\n"
+        f"- MarketCap (USD): {fmt_usd(onchain.get('marketcap_usd'))}\n"
+        f"- Volumen 24h (USD): {fmt_usd(onchain.get('volume_24h_usd'))}\n"
+        f"- High 24h (USD): {fmt_usd_dec(onchain.get('high_24h_usd'))}\n"
+        f"- Low 24h (USD): {fmt_usd_dec(onchain.get('low_24h_usd'))}\n"
+        f"- ATH histórico (USD): {fmt_usd(onchain.get('ath_price_usd'))}\n"
+        f"- Circulating Supply: {fmt_num(onchain.get('circulating_supply'), ' BTC')}\n"
+        f"- Total Supply: {fmt_num(onchain.get('total_supply'), ' BTC')}\n"
+        # La dominancia la devuelve calculate_indicators
+        f"- BTC Dominance: {fmt_pct(ind.get('btc_dominance'))}\n"
+        f"- Global MarketCap (USD): {fmt_usd(onchain.get('total_marketcap_usd'))}\n"
+        f"- Global Volumen 24h (USD): {fmt_usd(onchain.get('total_volume_24h_usd'))}\n"
+        f"- Hashrate (TH/s): {f'{hr:,.2f} TH/s' if isinstance(hr, (int, float)) else 'N/D'}\n"
+        f"- Whale Count (≥1000 BTC): {fmt_num(onchain.get('whale_count'))}\n"
+    )
+    return block + trend_context()
+
+def format_analysis_message(ind):
+    """Texto del informe de análisis que envía el scheduler."""
+    return (
+        f"📟Análisis Completado - Informe 1º:\n"
+        f"Precio BTC: ${fmt_dec(ind.get('price'))}\n"
+        f"RSI: {fmt_dec(ind.get('rsi'))}\n"
+        f"MACD: {fmt_dec(ind.get('macd'))} (Señal: {fmt_dec(ind.get('macd_signal'))})\n"
+        f"ADX: {fmt_dec(ind.get('adx'))}\n"
+        f"SMA: {fmt_dec(ind.get('sma_10'))} | {fmt_dec(ind.get('sma_25'))} | {fmt_dec(ind.get('sma_50'))}\n"
+        f"Volumen: {ind.get('volume_level', 'N/A')} (CMF: {fmt_dec(ind.get('cmf'))})\n\n"
+        f"BTC Dominancia: {fmt_pct(ind.get('btc_dominance'))}"
+    )
+
+def format_monitor_message(ind):
+    """Texto de estado del mercado que registra MarketMonitor."""
+    return (
+        f"📊 {SYMBOL}:\n"
+        f"Precio: ${fmt_dec(ind.get('price'))}\n"
+        f"RSI: {fmt_dec(ind.get('rsi'))}\n"
+        f"MACD: {fmt_dec(ind.get('macd'))} (Señal: {fmt_dec(ind.get('macd_signal'))})\n"
+        f"ADX: {fmt_dec(ind.get('adx'))}\n"
+        f"SMA: {fmt_dec(ind.get('sma_10'))} / {fmt_dec(ind.get('sma_25'))} / {fmt_dec(ind.get('sma_50'))}\n"
+        f"Volumen: {ind.get('volume_level', 'N/D')} (CMF: {fmt_dec(ind.get('cmf'))})\n"
+        f"Bandas de Bollinger: Low ${fmt_dec(ind.get('bb_low'))}, Med ${fmt_dec(ind.get('bb_medium'))}, High ${fmt_dec(ind.get('bb_high'))}\n"
+        f"BTC Dominancia: {fmt_pct(ind.get('btc_dominance'))}"
+    )
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """
+    Foto inmutable del mercado con los bloques de texto ya formateados.
+    Se reemplaza completa en cada refresco; los consumidores solo la leen.
+    """
+    created_at: float
+    indicators: MappingProxyType
+    onchain: MappingProxyType
+    indicators_block: str
+    onchain_block: str
+    analysis_text: str
+    monitor_text: str
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+# Última foto disponible (None hasta el primer refresco)
+_SNAPSHOT = None
+_service_started = False
+_service_lock = threading.Lock()
+
+def build_snapshot():
+    """Obtiene indicadores y datos on-chain y arma una MarketSnapshot nueva."""
+    ind = calculate_indicators(fetch_data(SYMBOL, TIMEFRAME))
+    onchain = fetch_onchain_stats()
+    record_sample({"price": ind.get("price")})
+    return MarketSnapshot(
+        created_at=time.time(),
+        indicators=MappingProxyType(dict(ind)),
+        onchain=MappingProxyType(dict(onchain)),
+        indicators_block=format_indicators_block(ind),
+        onchain_block=format_onchain_block(onchain, ind),
+        analysis_text=format_analysis_message(ind),
+        monitor_text=format_monitor_message(ind),
+    )
+
+def refresh_snapshot():
+    """Refresca la foto global; si falla, se conserva la anterior."""
+    global _SNAPSHOT
+    try:
+        _SNAPSHOT = build_snapshot()
+    except Exception as e:
+        logging.error(f"[Snapshot] Error al refrescar la foto de mercado: {e}")
+    return _SNAPSHOT
+
+def get_snapshot(max_age=3 * SNAPSHOT_REFRESH_INTERVAL):
+    """
+    Devuelve la última MarketSnapshot en O(1), o None si aún no existe
+    o si tiene más de `max_age` segundos.
+    """
+    snap = _SNAPSHOT
+    if snap is None or (max_age is not None and snap.age > max_age):
+        return None
+    return snap
+
+def snapshot_loop():
+    while True:
+        refresh_snapshot()
+        log_cache_health()
+        log_quota_metrics()
+        time.sleep(SNAPSHOT_REFRESH_INTERVAL)
+
+def start_snapshot_service():
+    """Inicia (una sola vez) el hilo que refresca la foto cada SNAPSHOT_REFRESH_INTERVAL segundos."""
+    global _service_started
+    with _service_lock:
+        if _service_started:
+            return
+        _service_started = True
+    threading.Thread(target=snapshot_loop, daemon=True).start()
@@ -1,16 +1,84 @@
 import sqlite3
 import time
+import hashlib
 import datetime
+import threading
+from contextlib import contextmanager
 
-DB_NAME = 'higgs_memory.db'
+from config import MEMORY_DB
+
+DB_NAME = MEMORY_DB
+
+# Espera máxima (s) cuando otro proceso tiene la base bloqueada
+BUSY_TIMEOUT = 5.0
+# Sentencias preparadas que conserva cada conexión (se reutilizan por texto SQL)
+CACHED_STATEMENTS = 128
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # lectores y escritor no se bloquean entre sí
+    "PRAGMA synchronous=NORMAL",    # con WAL no hace falta fsync en cada commit
+    "PRAGMA cache_size=-8000",      # 8 MB de cache de páginas por conexión
+    "PRAGMA temp_store=MEMORY",
+)
+
+class ConnectionManager:
+    """
+    Una conexión persistente a DB_NAME por hilo (sqlite3 no permite compartir
+    una conexión entre hilos sin bloquearla entera), configurada una sola vez
+    con WAL y los PRAGMAS de arriba. Las escrituras de este proceso se hacen
+    de una en una con un lock, así que no chocan entre sí; el busy timeout
+    cubre a otros procesos. Si DB_NAME cambia (p. ej. en pruebas) cada hilo
+    reconecta al nuevo fichero.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.path == DB_NAME:
+            return conn
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT, cached_statements=CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        self._local.conn = conn
+        self._local.path = DB_NAME
+        return conn
+
+    @contextmanager
+    def read(self):
+        yield self.connection()
+
+    @contextmanager
+    def write(self):
+        """Conexión para escribir: hace commit al salir (o rollback si hay excepción)."""
+        with self._write_lock:
+            conn = self.connection()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+# Conexiones compartidas por todas las funciones del módulo
+DB = ConnectionManager()
 
 def init_db():
     """Crea la base de datos y las tablas necesarias si no existen.
-    Se crean dos tablas:
+    Se crean cinco tablas:
       - messages: para almacenar el historial de mensajes (inputs y respuestas)
       - tasks: para almacenar tareas programadas, con la hora de ejecución prevista.
+      - model_routes: decisiones del router de modelos (ruta, modelo, latencia).
+      - api_usage: llamadas diarias a APIs con cuota, por proveedor y endpoint.
+      - translations: cache persistente de traducciones (texto + par de idiomas).
     """
-    conn = sqlite3.connect(DB_NAME)
+    with DB.write() as conn:
+        _create_tables(conn)
+
+def _create_tables(conn):
     c = conn.cursor()
     # Tabla para mensajes del chat
     c.execute('''
@@ -30,26 +98,56 @@ def init_db():
             status TEXT DEFAULT 'pending'
         )
     ''')
-    conn.commit()
-    conn.close()
+    # Registro de decisiones del router de modelos (para ajustarlo)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS model_routes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            route TEXT,
+            model TEXT,
+            question TEXT,
+            latency_ms INTEGER,
+            cached INTEGER DEFAULT 0
+        )
+    ''')
+    # Consumo de APIs con cuota (para no perder la cuenta al reiniciar)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS api_usage (
+            day TEXT,
+            provider TEXT,
+            endpoint TEXT,
+            calls INTEGER DEFAULT 0,
+            PRIMARY KEY (day, provider, endpoint)
+        )
+    ''')
+    # Cache de traducciones de MyMemory
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS translations (
+            langpair TEXT,
+            source_hash TEXT,
+            translated TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (langpair, source_hash)
+        )
+    ''')
 
 def store_message(username, content):
     """Almacena un mensaje en la base de datos."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('INSERT INTO messages (username, content) VALUES (?, ?)', (username, content))
-    conn.commit()
-    conn.close()
+    with DB.write() as conn:
+        conn.execute('INSERT INTO messages (username, content) VALUES (?, ?)', (username, content))
+
+def get_recent_message_rows(limit=10):
+    """Recupera los últimos 'limit' mensajes como tuplas (timestamp, username, content), en orden cronológico."""
+    with DB.read() as conn:
+        rows = conn.execute(
+            'SELECT timestamp, username, content FROM messages ORDER BY id DESC LIMIT ?', (limit,)
+        ).fetchall()
+    return [tuple(row) for row in reversed(rows)]
 
 def get_recent_messages(limit=10):
     """Recupera los últimos 'limit' mensajes, en orden cronológico."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('SELECT timestamp, username, content FROM messages ORDER BY timestamp DESC LIMIT ?', (limit,))
-    rows = c.fetchall()
-    conn.close()
-    messages = [f"[{ts}] {username}: {content}" for ts, username, content in rows]
-    return "\n".join(messages[::-1])
+    messages = [f"[{ts}] {username}: {content}" for ts, username, content in get_recent_message_rows(limit)]
+    return "\n".join(messages)
 
 def add_task(description, scheduled_time):
     """
@@ -60,28 +158,58 @@ def add_task(description, scheduled_time):
         scheduled_time_str = scheduled_time.strftime("%Y-%m-%d %H:%M:%S")
     else:
         scheduled_time_str = str(scheduled_time)
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('INSERT INTO tasks (scheduled_time, description) VALUES (?, ?)', (scheduled_time_str, description))
-    conn.commit()
-    conn.close()
+    with DB.write() as conn:
+        conn.execute('INSERT INTO tasks (scheduled_time, description) VALUES (?, ?)', (scheduled_time_str, description))
 
 def update_task_status(task_id, new_status):
     """Actualiza el estado de una tarea."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('UPDATE tasks SET status = ? WHERE id = ?', (new_status, task_id))
-    conn.commit()
-    conn.close()
+    with DB.write() as conn:
+        conn.execute('UPDATE tasks SET status = ? WHERE id = ?', (new_status, task_id))
+
+def log_route(route, model, question, latency_s, cached=False):
+    """Registra qué ruta/modelo atendió una consulta y cuánto tardó."""
+    with DB.write() as conn:
+        conn.execute(
+            'INSERT INTO model_routes (route, model, question, latency_ms, cached) VALUES (?, ?, ?, ?, ?)',
+            (route, model, question, int(latency_s * 1000), int(cached))
+        )
+
+def add_api_usage(day, provider, endpoint, calls=1):
+    """Suma `calls` llamadas al contador diario de un proveedor/endpoint."""
+    with DB.write() as conn:
+        conn.execute(
+            'INSERT INTO api_usage (day, provider, endpoint, calls) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(day, provider, endpoint) DO UPDATE SET calls = calls + excluded.calls',
+            (day, provider, endpoint, calls)
+        )
+
+def get_api_usage(day):
+    """Llamadas del día `day` (YYYY-MM-DD, UTC) como {(proveedor, endpoint): llamadas}."""
+    with DB.read() as conn:
+        rows = conn.execute('SELECT provider, endpoint, calls FROM api_usage WHERE day = ?', (day,)).fetchall()
+    return {(provider, endpoint): calls for provider, endpoint, calls in rows}
+
+def _text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def get_translation(text, langpair):
+    """Traducción guardada de `text` para `langpair` (p. ej. "en|es"), o None."""
+    with DB.read() as conn:
+        row = conn.execute('SELECT translated FROM translations WHERE langpair = ? AND source_hash = ?',
+                           (langpair, _text_hash(text))).fetchone()
+    return row[0] if row else None
+
+def store_translation(text, langpair, translated):
+    """Guarda la traducción de `text` para `langpair`."""
+    with DB.write() as conn:
+        conn.execute('INSERT OR REPLACE INTO translations (langpair, source_hash, translated) VALUES (?, ?, ?)',
+                     (langpair, _text_hash(text), translated))
 
 def get_pending_tasks():
     """Recupera todas las tareas pendientes y las devuelve como lista de diccionarios."""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row  # Para acceder por nombre de columna
-    c = conn.cursor()
-    c.execute("SELECT id, scheduled_time, description FROM tasks WHERE status = ?", ('pending',))
-    rows = c.fetchall()
-    conn.close()
+    with DB.read() as conn:
+        rows = conn.execute("SELECT id, scheduled_time, description FROM tasks WHERE status = ?",
+                            ('pending',)).fetchall()
     tasks = []
     for row in rows:
         tasks.append({
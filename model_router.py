@@ -0,0 +1,80 @@
+# model_router.py
+
+import re
+
+from config import SYMBOL, OPENAI_FAST_MODEL, OPENAI_DEEP_MODEL
+
+# Rutas posibles para una consulta en el thread de Higgs
+ROUTE_TEMPLATE = "plantilla"   # respuesta local con indicadores, sin OpenAI
+ROUTE_FAST = "rapido"          # modelo rápido y barato, prompt corto
+ROUTE_DEEP = "profundo"        # GPT-4 con todo el contexto
+
+FAST_MODEL_MAX_TOKENS = 200
+
+GREETING_WORDS = {
+    "hola", "buenas", "buenos", "hey", "hi", "hello", "saludos", "gracias",
+    "thanks", "ok", "vale", "genial", "dias", "días", "tardes", "noches",
+}
+# Nombre del bot: "Hola Higgs", "Gracias Higgs X" siguen siendo saludos
+BOT_NAME_WORDS = {"higgs", "higgsx", "x"}
+PRICE_PATTERNS = re.compile(
+    r"\b(precio|cu[aá]nto (est[aá]|vale|cuesta)|a cu[aá]nto|price|cotiza(ci[oó]n)?)\b"
+)
+DEEP_PATTERNS = re.compile(
+    r"\b(an[aá]lisis|analiza\w*|tendencia\w*|proyecci[oó]n|predic\w*|pron[oó]stico|"
+    r"soporte\w*|resistencia\w*|estrategia\w*|por qu[eé]|noticia\w*|on-?chain|"
+    r"hashrate|dominancia|macro|fed|etf|compar\w*|escenario\w*|riesgo\w*|"
+    r"corto plazo|largo plazo|deber[ií]a|conviene|entrada|salida|c[oó]mo ves|opin\w*|qu[eé] piensas)\b"
+)
+# Mensajes de más palabras que esto se consideran análisis aunque no tengan palabras clave
+DEEP_MIN_WORDS = 25
+TEMPLATE_MAX_WORDS = 6
+
+def classify_route(text, has_article=False):
+    """
+    Clasifica la consulta localmente (sin red) y devuelve (ruta, modelo).
+    `has_article` indica que el texto casa con una noticia del índice local
+    (news.search_article_by_title): esas consultas necesitan el artículo y van
+    a ROUTE_DEEP aunque no tengan palabras clave de análisis.
+    El modelo es None para ROUTE_TEMPLATE.
+    """
+    lower = text.lower()
+    words = re.findall(r"\w+", lower)
+
+    if has_article or DEEP_PATTERNS.search(lower) or len(words) >= DEEP_MIN_WORDS:
+        return ROUTE_DEEP, OPENAI_DEEP_MODEL
+    if len(words) <= TEMPLATE_MAX_WORDS:
+        if PRICE_PATTERNS.search(lower):
+            return ROUTE_TEMPLATE, None
+        if words and all(w in GREETING_WORDS or w in BOT_NAME_WORDS for w in words):
+            return ROUTE_TEMPLATE, None
+    return ROUTE_FAST, OPENAI_FAST_MODEL
+
+def template_answer(text, username, ind):
+    """
+    Respuesta construida localmente con la salida de calculate_indicators,
+    para saludos y consultas simples de precio.
+    """
+    price = ind.get("price")
+    rsi = ind.get("rsi")
+    if not isinstance(price, (int, float)):
+        return (
+            f"@{username}, aquí Higgs X. Los sensores de mercado no responden ahora mismo; "
+            "vuelve a consultar en unos minutos.\n— Higgs X"
+        )
+    prev = ind.get("prev_close")
+    change = ""
+    if isinstance(prev, (int, float)) and prev:
+        change = f" ({(price - prev) / prev * 100:+.2f}% en la última vela)"
+    rsi_str = f"{rsi:.2f}" if isinstance(rsi, (int, float)) else "N/D"
+
+    if PRICE_PATTERNS.search(text.lower()):
+        return (
+            f"@{username}, {SYMBOL} cotiza en ${price:,.2f}{change}.\n"
+            f"RSI: {rsi_str} | Volumen: {ind.get('volume_level', 'N/D')}\n— Higgs X"
+        )
+    return (
+        f"@{username}, aquí Higgs X, vigilando la cadena. "
+        f"{SYMBOL} en ${price:,.2f}{change}, RSI {rsi_str}. "
+        "¿Qué quieres que analice?\n— Higgs X"
+    )
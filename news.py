@@ -1,184 +1,330 @@
 # news.py
 
+import re
+import time
 import requests
 import logging
-from datetime import datetime, timedelta
-from config import NEWS_API_KEY  # La API key se define en config.py
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from config import (
+    MYMEMORY_API_BASE,
+    ARTICLE_CACHE_TTL,
+    TRANSLATION_MAX_WORKERS,
+    TRANSLATION_CHUNK_BYTES,
+    ARTICLE_PREFETCH_WORKERS,
+    NEWS_RECENCY_HALF_LIFE,
+)
 from newspaper import Article
+from swr_cache import swr_cached
+from memoria import get_translation, store_translation
+from news_store import NEWS_STORE, ensure_fresh
 
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s [%(levelname)s] %(message)s')
 
-REQUIRED_KEYWORDS = [
-    "sui", "etf", "bitcoin", "ethereum", "microstrategy", "grayscale", "blackrock",
-    "fidelity", "ark invest", "bitwise", "ripple", "xrp", "cardano", "ondo", "aave",
-    "avax", "gold", "interest rate", "powell", "crypto", "fed", "federal reserve",
-    "solana", "memecoin", "elon musk", "dogecoin", "shiba inu", "metaverse",
-    "defi", "huobi", "hashrate", "gas fees", "blockchain", "japan",
-    "nvidia", "traders", "alcoin"
-]
+_TRANSLATION_EXECUTOR = ThreadPoolExecutor(max_workers=TRANSLATION_MAX_WORKERS, thread_name_prefix="traduccion")
+# Descarga en segundo plano de los artículos de los titulares publicados
+_PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=ARTICLE_PREFETCH_WORKERS, thread_name_prefix="prefetch")
 
-def is_informative(title):
+# Palabras clave de los titulares que interesan y su peso en la relevancia
+KEYWORD_WEIGHTS = {
+    "bitcoin": 3, "etf": 3, "fed": 3, "federal reserve": 3, "interest rate": 3, "powell": 3,
+    "blackrock": 2, "microstrategy": 2, "grayscale": 2, "fidelity": 2, "hashrate": 2,
+    "ethereum": 2, "crypto": 2, "cryptocurrency": 2, "cryptocurrencies": 2,
+    "ark invest": 1, "bitwise": 1, "ripple": 1, "xrp": 1, "cardano": 1, "ondo": 1, "aave": 1,
+    "avax": 1, "gold": 1, "solana": 1, "sui": 1, "memecoin": 1, "elon musk": 1, "dogecoin": 1,
+    "shiba inu": 1, "metaverse": 1, "defi": 1, "huobi": 1, "gas fees": 1, "blockchain": 1,
+    "japan": 1, "nvidia": 1, "traders": 1, "altcoin": 1,
+}
+REQUIRED_KEYWORDS = list(KEYWORD_WEIGHTS)
+
+# Una sola regex para todas las palabras clave (las largas primero), solo palabras completas
+# (admite plural: "ETFs", "altcoins"), compilada una vez
+_KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(re.escape(k).replace(r"\ ", r"\s+")
+                      for k in sorted(KEYWORD_WEIGHTS, key=len, reverse=True)) + r")(?:e?s)?\b",
+    re.IGNORECASE,
+)
+
+def match_keywords(title):
+    """Palabras clave (de KEYWORD_WEIGHTS) presentes en el titular."""
     if not title:
-        return False
-    title_lower = title.lower()
-    return any(keyword in title_lower for keyword in REQUIRED_KEYWORDS)
+        return set()
+    return {" ".join(m.group(1).lower().split()) for m in _KEYWORD_RE.finditer(title)}
 
-def translate_to_spanish(text):
+def keyword_score(title):
+    """Suma de los pesos de las palabras clave del titular (0 si no tiene ninguna)."""
+    return sum(KEYWORD_WEIGHTS[k] for k in match_keywords(title))
+
+def is_informative(title):
+    return keyword_score(title) > 0
+
+def headline_rank(title, published_ts, now=None):
+    """Relevancia por palabras clave atenuada con la antigüedad (mitad cada NEWS_RECENCY_HALF_LIFE)."""
+    age = max(0.0, (now or time.time()) - (published_ts or 0))
+    return keyword_score(title) * 0.5 ** (age / NEWS_RECENCY_HALF_LIFE)
+
+def _translate(text, langpair):
     """
-    Traduce 'text' de inglés a español usando el API gratuito MyMemory.
-    Si falla, devuelve el texto original.
+    Traduce 'text' con el API gratuito MyMemory (`langpair` p. ej. "en|es").
+    Devuelve (texto, traducido): si falla, el texto original y False.
+    Las traducciones se guardan en memoria (tabla translations) y no se
+    vuelven a pedir; los fallos no se guardan.
     """
+    if not text:
+        return text, True
+    try:
+        cached = get_translation(text, langpair)
+    except Exception as e:
+        logging.error("Error al leer la cache de traducciones: %s", e)
+        cached = None
+    if cached is not None:
+        return cached, True
+
     try:
         params = {
             "q": text,
-            "langpair": "en|es"
+            "langpair": langpair
         }
-        resp = requests.get("https://api.mymemory.translated.net/get", params=params, timeout=5)
+        resp = requests.get(f"{MYMEMORY_API_BASE}/get", params=params, timeout=5)
         resp.raise_for_status()
         data = resp.json()
-        return data.get("responseData", {}).get("translatedText", text)
+        translated = data.get("responseData", {}).get("translatedText")
+        # MyMemory responde 200 con un aviso en el texto cuando se agota la cuota
+        if not translated or str(data.get("responseStatus", 200)) != "200":
+            return text, False
     except Exception:
-        return text
+        return text, False
 
-def translate_to_english(text):
+    try:
+        store_translation(text, langpair, translated)
+    except Exception as e:
+        logging.error("Error al guardar la traducción: %s", e)
+    return translated, True
+
+def translate(text, langpair):
     """
-    Traduce 'text' de español a inglés usando el API gratuito MyMemory.
+    Traduce 'text' con el API gratuito MyMemory (`langpair` p. ej. "en|es").
     Si falla, devuelve el texto original.
     """
-    try:
-        params = {
-            "q": text,
-            "langpair": "es|en"
-        }
-        resp = requests.get("https://api.mymemory.translated.net/get", params=params, timeout=5)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("responseData", {}).get("translatedText", text)
-    except Exception:
-        return text
+    return _translate(text, langpair)[0]
 
-def test_get_headlines(limit=4):
+def _translate_many(texts, langpair):
+    return list(_TRANSLATION_EXECUTOR.map(lambda text: _translate(text, langpair), texts))
+
+def translate_many(texts, langpair):
+    """Traduce varios textos a la vez (los que no estén en cache, en paralelo)."""
+    return [text for text, _ in _translate_many(texts, langpair)]
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+")
+
+def _byte_len(text):
+    return len(text.encode("utf-8"))
+
+def _split_long(sentence, max_bytes):
+    """Parte una frase demasiado larga por palabras (o por caracteres si una palabra no cabe)."""
+    pieces, current = [], ""
+    for word in sentence.split():
+        while _byte_len(word) > max_bytes:
+            cut = max_bytes
+            while _byte_len(word[:cut]) > max_bytes:
+                cut -= 1
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(word[:cut])
+            word = word[cut:]
+        candidate = f"{current} {word}" if current else word
+        if _byte_len(candidate) > max_bytes:
+            pieces.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_for_translation(paragraph, max_bytes=TRANSLATION_CHUNK_BYTES):
+    """
+    Divide un párrafo en trozos de como mucho `max_bytes` bytes, cortando
+    por final de frase (y solo por palabras si una frase no cabe entera).
+    """
+    chunks, current = [], ""
+    for sentence in _SENTENCE_END_RE.split(paragraph.strip()):
+        if not sentence:
+            continue
+        candidate = f"{current} {sentence}" if current else sentence
+        if _byte_len(candidate) <= max_bytes:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        if _byte_len(sentence) <= max_bytes:
+            current = sentence
+        else:
+            *head, current = _split_long(sentence, max_bytes)
+            chunks.extend(head)
+    if current:
+        chunks.append(current)
+    return chunks
+
+def translate_long(text, langpair):
+    """
+    Traduce textos de cualquier longitud: los divide por párrafos y frases
+    en trozos que MyMemory acepta, los traduce en paralelo (cada trozo con
+    su propia entrada en la cache de traducciones) y los vuelve a unir en
+    orden. Devuelve (texto, completo): un trozo que falle queda en el idioma
+    original y `completo` es False.
+    """
+    if not text or _byte_len(text) <= TRANSLATION_CHUNK_BYTES:
+        return _translate(text, langpair)
+    paragraphs = [split_for_translation(p) for p in text.split("\n")]
+    results = _translate_many([chunk for chunks in paragraphs for chunk in chunks], langpair)
+    translated = iter(text for text, _ in results)
+    complete = all(ok for _, ok in results)
+    return "\n".join(" ".join(next(translated) for _ in chunks) for chunks in paragraphs), complete
+
+def translate_to_spanish(text):
+    """
+    Traduce 'text' de inglés a español usando el API gratuito MyMemory
+    (por trozos si es largo). Si falla, devuelve el texto original.
+    """
+    return translate_long(text, "en|es")[0]
+
+def translate_to_english(text):
     """
-    Obtiene titulares de NewsAPI (inglés), filtra por palabras clave
-    y traduce al español. Devuelve hasta 'limit' titulares en español.
+    Traduce 'text' de español a inglés usando el API gratuito MyMemory
+    (por trozos si es largo). Si falla, devuelve el texto original.
     """
-    url = "https://newsapi.org/v2/everything"
-    now = datetime.utcnow()
-    two_days_ago = now - timedelta(days=2)
-    query = 'bitcoin OR crypto OR blockchain OR FED OR "Federal Reserve" OR ETF OR traders'
+    return translate_long(text, "es|en")[0]
 
-    params = {
-        "apiKey": NEWS_API_KEY,
-        "q": query,
-        "from": two_days_ago.strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "to": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "language": "en",
-        "sortBy": "publishedAt",
-        "pageSize": 50
-    }
+ARTICLE_ERROR_MESSAGE = "No se pudo extraer el contenido de la noticia."
 
+def test_get_headlines(limit=4):
+    """
+    Titulares de las últimas 48 horas desde el almacén local de noticias
+    (news_store, alimentado por la ingesta incremental de NewsAPI), uno por
+    noticia aunque la publiquen varios medios. Los ordena por relevancia
+    (palabras clave con peso) y recencia, y traduce al español solo los
+    'limit' titulares que se van a mostrar.
+    """
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("status") != "ok":
-            logging.error("Error en la respuesta de NewsAPI: %s", data)
-            return "Error en la respuesta de NewsAPI."
-        articles = data.get("articles", [])
-        unique_headlines = []
-        seen = set()
+        ensure_fresh()
+        now = time.time()
+        ranked = []
+        for article in NEWS_STORE.recent(now - 2 * 86400):
+            title = (article.get("title") or "").strip()
+            rank = headline_rank(title, article.get("published_ts"), now)
+            if rank > 0:
+                ranked.append((rank, article.get("published_ts") or 0, title, article))
+        ranked.sort(key=lambda r: (r[0], r[1]), reverse=True)
 
-        for article in articles:
-            title = article.get("title")
-            if title:
-                title = title.strip()
-            else:
-                continue
+        selected = []
+        seen = set()
 
-            if not is_informative(title):
+        for _rank, _ts, title, article in ranked:
+            if title.lower() in seen:
                 continue
+            seen.add(title.lower())
 
-            # Traducir al español usando MyMemory
-            title_es = translate_to_spanish(title)
-
-            published_at = article.get("publishedAt", "")
+            published_at = article.get("published_at", "")
             try:
                 pub_date = datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ")
                 pub_date_str = pub_date.strftime("%Y-%m-%d %H:%M")
             except Exception:
                 pub_date_str = published_at
 
-            if title_es not in seen:
-                unique_headlines.append(f"{pub_date_str} - {title_es}")
-                seen.add(title_es)
+            selected.append((pub_date_str, title, article.get("url")))
+            if len(selected) >= limit:
+                break  # no hace falta mirar (ni traducir) más titulares
 
-        if unique_headlines:
-            return "\n".join(unique_headlines[:limit])
-        else:
+        if not selected:
             return "No se encontraron titulares informativos."
 
-    except requests.exceptions.HTTPError as http_err:
-        logging.error("Error al obtener noticias: %s", http_err)
-        return "Error al obtener titulares."
+        # Traducir al español usando MyMemory (cache + peticiones en paralelo)
+        titles_es = translate_many([title for _, title, _ in selected], "en|es")
+        # Indexar el titular traducido: es el que verá (y citará) el usuario
+        for (_, _, url), title_es in zip(selected, titles_es):
+            NEWS_STORE.add_translation(url, title_es=title_es)
+        # Dejar listos los artículos por si alguien pregunta por un titular
+        prefetch_articles([url for _, _, url in selected])
+        return "\n".join(f"{pub_date_str} - {title_es}" for (pub_date_str, _, _), title_es in zip(selected, titles_es))
+
     except Exception as e:
         logging.error("Excepción al obtener titulares: %s", e)
         return f"Excepción al obtener titulares: {e}"
 
 def search_article_by_title(title):
     """
-    Busca en NewsAPI un artículo que coincida exactamente (entre comillas) con el título dado.
-    Dado que el usuario puede pasar el título en español, primero lo traducimos a inglés.
-    Retorna la URL del primer artículo encontrado o None si no se encuentra.
-    """
-    url = "https://newsapi.org/v2/everything"
-    now = datetime.utcnow()
-    two_days_ago = now - timedelta(days=2)
-
-    # Traducir el título de español a inglés antes de buscar
-    title_en = translate_to_english(title)
-
-    params = {
-       "apiKey": NEWS_API_KEY,
-       "q": f'"{title_en}"',
-       "from": two_days_ago.strftime("%Y-%m-%dT%H:%M:%SZ"),
-       "to": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
-       "language": "en",
-       "sortBy": "publishedAt",
-       "pageSize": 1
-    }
+    Busca en el índice local de noticias (news_store, FTS5) el artículo del
+    que habla el texto dado, en español o en inglés, sin llamadas de red.
+    Retorna la URL del artículo o None si ninguno casa lo suficiente.
+    """
     try:
-       response = requests.get(url, params=params, timeout=10)
-       response.raise_for_status()
-       data = response.json()
-       if data.get("status") != "ok":
-          logging.error("Error en search_article_by_title: %s", data)
-          return None
-       articles = data.get("articles", [])
-       if articles:
-          return articles[0].get("url")
-       else:
-          return None
+        article = NEWS_STORE.find_article(title)
     except Exception as e:
-       logging.error("Excepción en search_article_by_title: %s", e)
-       return None
+        logging.error("Excepción en search_article_by_title: %s", e)
+        return None
+    return article["url"] if article else None
 
-def get_article_content(article_url):
+@swr_cached("articulos", ttl=ARTICLE_CACHE_TTL, max_entries=64,
+            is_valid=lambda article: article[1], default=(ARTICLE_ERROR_MESSAGE, False))
+def _load_article(article_url):
     """
     Descarga y extrae el contenido del artículo usando Newspaper (en inglés),
-    y luego lo traduce al español. Retorna el texto traducido o un mensaje de error.
+    y luego lo traduce al español. Retorna (texto, traducido).
+    El cuerpo se guarda por URL en news_store, así que cada artículo se
+    descarga una sola vez (también entre reinicios). Si la traducción queda
+    incompleta se guarda solo el original en inglés y se devuelve ese texto
+    sin darlo por bueno: la siguiente consulta vuelve a intentar traducirlo.
     """
     try:
-        article = Article(article_url)
-        article.download()
-        article.parse()
-        content = article.text
+        stored = NEWS_STORE.get_body(article_url)
+        if stored and stored["content_es"]:
+            return stored["content_es"], True
+        if stored and stored["content"]:
+            content = stored["content"]
+        else:
+            article = Article(article_url)
+            article.download()
+            article.parse()
+            content = article.text
         if not content:
-            return "No se pudo extraer el contenido de la noticia."
+            return ARTICLE_ERROR_MESSAGE, False
         # Traducir todo el contenido al español
-        return translate_to_spanish(content)
+        content_es, complete = translate_long(content, "en|es")
+        if not complete:
+            logging.warning("Traducción incompleta de %s; se guarda el original en inglés.", article_url)
+            NEWS_STORE.store_body(article_url, content, None)
+            return content, False
+        NEWS_STORE.store_body(article_url, content, content_es)
+        NEWS_STORE.add_translation(article_url, content_es=content_es)
+        return content_es, True
     except Exception as e:
         logging.error("Error al extraer contenido de la noticia: %s", e)
-        return "No se pudo extraer el contenido de la noticia."
+        return ARTICLE_ERROR_MESSAGE, False
+
+def get_article_content(article_url):
+    """
+    Contenido del artículo traducido al español (o en inglés si la traducción
+    no se pudo completar), o un mensaje de error.
+    """
+    return _load_article(article_url)[0]
+
+def _prefetch_article(article_url):
+    try:
+        get_article_content(article_url)
+    except Exception as e:
+        logging.error("Error al precargar la noticia %s: %s", article_url, e)
+
+def prefetch_articles(urls):
+    """
+    Descarga, extrae y traduce en segundo plano los artículos de `urls`.
+    Si un usuario pregunta por uno mientras tanto, get_article_content
+    espera a esa misma descarga en vez de lanzar otra.
+    """
+    for url in urls:
+        if url:
+            _PREFETCH_EXECUTOR.submit(_prefetch_article, url)
 
 if __name__ == "__main__":
     print("Titulares obtenidos:")
@@ -0,0 +1,514 @@
+# news_store.py
+
+import re
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from config import (
+    NEWS_API_KEY,
+    NEWS_API_BASE,
+    NEWS_DB,
+    NEWS_INGEST_INTERVAL,
+    NEWS_INGEST_MAX_PAGES,
+    NEWS_RETENTION_DAYS,
+    NEWS_DUP_THRESHOLD,
+    NEWS_SEARCH_MIN_COVERAGE,
+    ARTICLE_CACHE_MAX_BYTES,
+)
+from api_quota import QUOTA, PROVIDER_NEWSAPI
+
+NEWS_QUERY = 'bitcoin OR crypto OR blockchain OR FED OR "Federal Reserve" OR ETF OR traders'
+NEWSAPI_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+# Primera ingesta (sin cursor): las últimas 48 horas, como hacía test_get_headlines
+INITIAL_LOOKBACK = timedelta(days=2)
+PAGE_SIZE = 100
+
+# MinHash: NUM_PERM permutaciones en BANDS bandas de ROWS filas (LSH).
+# Con 16x4, dos titulares con Jaccard 0,7 comparten alguna banda el 99 % de las veces
+# (1 - (1 - 0,7^4)^16) y con 0,6 el 89 %; por debajo de 0,4 casi nunca.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.sha1(f"a{i}".encode()).digest()[:8], "big") % _MERSENNE_PRIME | 1,
+     int.from_bytes(hashlib.sha1(f"b{i}".encode()).digest()[:8], "big") % _MERSENNE_PRIME)
+    for i in range(NUM_PERM)
+]
+# Versión de shingles(): si cambia, las firmas guardadas se recalculan al arrancar
+SIGNATURE_VERSION = "c5"
+# Sufijo con el medio que NewsAPI añade a muchos titulares ("... - Reuters")
+_SOURCE_SUFFIX_RE = re.compile(r"\s+[-|–—]\s+[^-|–—]{1,40}$")
+
+# Búsqueda de texto completo: palabras vacías (EN y ES) que no cuentan para buscar
+STOPWORDS = set("""
+a al algo ante como con contra cual de del desde donde el ella en entre era es esa ese eso esta este esto
+fue ha han hay la las le les lo los mas me mi muy no nos o para pero por que se sea segun ser si sin sobre
+su sus tambien te tiene tu un una uno unos y ya yo opinas piensas crees sabes dime explica noticia
+about after an and are as at be been but by for from has have how in into is it its of on or over says
+than that the their this to up was were what when which who will with new
+""".split())
+SEARCH_CANDIDATES = 10
+MAX_QUERY_TERMS = 32
+
+def search_terms(text):
+    """Palabras del texto en minúsculas y sin tildes, sin palabras vacías ni muy cortas."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch if ch.isalnum() else " " for ch in text if not unicodedata.combining(ch))
+    return [w for w in text.split() if len(w) >= 3 and w not in STOPWORDS]
+
+def _term_matches(term, terms):
+    """Coincidencia aproximada: igual, o prefijo común de 4+ letras (bitcoin/bitcoins, sube/subir)."""
+    for other in terms:
+        if term == other:
+            return True
+        if len(term) >= 4 and len(other) >= 4 and (term.startswith(other[:max(4, len(other) - 2)])
+                                                   or other.startswith(term[:max(4, len(term) - 2)])):
+            return True
+    return False
+
+def _coverage(title, terms):
+    """Fracción de las palabras del titular que aparecen (aproximadamente) en `terms`."""
+    title_terms = set(search_terms(title or ""))
+    if not title_terms:
+        return 0.0
+    return sum(1 for t in title_terms if _term_matches(t, terms)) / len(title_terms)
+
+def url_hash(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+def shingles(title, k=5):
+    """
+    Conjunto de k-gramas de letras del título normalizado (sin el medio final,
+    en minúsculas, solo letras y números). A diferencia de los k-gramas de
+    palabras, un artículo o una palabra de más ("hit a record", "in a surprise
+    move") solo cambia unos pocos shingles: las versiones de distintos medios
+    quedan por encima de 0,7 y noticias distintas por debajo de 0,55.
+    """
+    text = _SOURCE_SUFFIX_RE.sub("", title.strip()).lower()
+    text = " ".join("".join(ch if ch.isalnum() else " " for ch in text).split())
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+def minhash(shingle_set):
+    """Firma MinHash (NUM_PERM enteros) de un conjunto de shingles."""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set] or [0]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+def similarity(sig_a, sig_b):
+    """Estimación de Jaccard entre dos firmas MinHash."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+def _band_keys(signature):
+    return [(band, hash(tuple(signature[band * ROWS:(band + 1) * ROWS])) & 0x7FFFFFFFFFFFFFFF)
+            for band in range(BANDS)]
+
+class NewsStore:
+    """
+    Artículos de NewsAPI guardados localmente (clave: hash de la URL).
+    Los titulares casi iguales de distintos medios se agrupan en un mismo
+    cluster con MinHash + LSH, así que las consultas devuelven una sola
+    versión de cada noticia. Un índice FTS5 (articles_fts) cubre titular,
+    descripción y cuerpo en inglés y, cuando ya se tradujeron, titular y
+    cuerpo en español, para encontrar la noticia de la que habla un mensaje.
+    Los cuerpos ya extraídos y traducidos se guardan por URL (article_bodies)
+    hasta ARTICLE_CACHE_MAX_BYTES, descartando primero los menos usados.
+    """
+    def __init__(self, path=NEWS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._bands = {}    # (banda, cubeta) -> [url_hash], recargado desde la base al arrancar
+        conn = self._connect()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS articles (
+                url_hash TEXT PRIMARY KEY,
+                url TEXT,
+                title TEXT,
+                description TEXT,
+                content TEXT,
+                source TEXT,
+                published_at TEXT,
+                published_ts REAL,
+                fetched_at REAL,
+                cluster TEXT,
+                signature BLOB
+            );
+            CREATE INDEX IF NOT EXISTS idx_articles_published ON articles (published_ts);
+            CREATE TABLE IF NOT EXISTS ingest_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                url_hash UNINDEXED,
+                title,
+                description,
+                content,
+                title_es,
+                content_es,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS article_bodies (
+                url_hash TEXT PRIMARY KEY,
+                url TEXT,
+                content TEXT,
+                content_es TEXT,
+                size INTEGER,
+                fetched_at REAL,
+                last_access REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_bodies_access ON article_bodies (last_access);
+        ''')
+        # Artículos guardados antes de existir el índice
+        conn.execute('''
+            INSERT INTO articles_fts (url_hash, title, description, content)
+            SELECT url_hash, title, description, content FROM articles
+            WHERE url_hash NOT IN (SELECT url_hash FROM articles_fts)
+        ''')
+        conn.commit()
+        if self.get_state("signature_version") != SIGNATURE_VERSION:
+            # Firmas calculadas con otra versión de shingles(): se rehacen una vez
+            conn.executemany('UPDATE articles SET signature = ? WHERE url_hash = ?', [
+                (array("Q", minhash(shingles(title))).tobytes(), h)
+                for h, title in conn.execute('SELECT url_hash, title FROM articles').fetchall()
+            ])
+            conn.commit()
+            self.set_state("signature_version", SIGNATURE_VERSION)
+        for h, blob in conn.execute('SELECT url_hash, signature FROM articles WHERE signature IS NOT NULL'):
+            self._add_to_bands(h, array("Q", blob).tolist())
+        conn.close()
+
+    def _add_to_bands(self, h, signature):
+        for key in _band_keys(signature):
+            self._bands.setdefault(key, []).append(h)
+
+    def _remove_from_bands(self, h, signature):
+        for key in _band_keys(signature):
+            bucket = self._bands.get(key)
+            if bucket is None:
+                continue
+            try:
+                bucket.remove(h)
+            except ValueError:
+                pass
+            if not bucket:
+                del self._bands[key]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ---------- estado de la ingesta ----------
+    def get_state(self, key, default=None):
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT value FROM ingest_state WHERE key = ?', (key,)).fetchone()
+        finally:
+            conn.close()
+        return row["value"] if row else default
+
+    def set_state(self, key, value):
+        conn = self._connect()
+        try:
+            conn.execute('INSERT OR REPLACE INTO ingest_state (key, value) VALUES (?, ?)', (key, value))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---------- altas ----------
+    def _find_cluster(self, conn, signature):
+        """Cluster del artículo ya guardado más parecido (≥ NEWS_DUP_THRESHOLD), o None."""
+        candidates = set()
+        for key in _band_keys(signature):
+            candidates.update(self._bands.get(key, ()))
+        best, best_sim = None, NEWS_DUP_THRESHOLD
+        for h in candidates:
+            row = conn.execute('SELECT cluster, signature FROM articles WHERE url_hash = ?', (h,)).fetchone()
+            if row is None:
+                continue
+            sim = similarity(signature, array("Q", row["signature"]).tolist())
+            if sim >= best_sim:
+                best, best_sim = row["cluster"], sim
+        return best
+
+    def add_articles(self, articles):
+        """Guarda los artículos nuevos (los ya vistos por URL se ignoran). Devuelve cuántos eran nuevos."""
+        added = 0
+        with self._lock:
+            conn = self._connect()
+            try:
+                for art in articles:
+                    url, title = art.get("url"), (art.get("title") or "").strip()
+                    if not url or not title or title == "[Removed]":
+                        continue
+                    h = url_hash(url)
+                    if conn.execute('SELECT 1 FROM articles WHERE url_hash = ?', (h,)).fetchone():
+                        continue
+                    signature = minhash(shingles(title))
+                    cluster = self._find_cluster(conn, signature) or h
+                    published_at = art.get("publishedAt", "")
+                    try:
+                        published_ts = datetime.strptime(published_at, NEWSAPI_TIME_FORMAT) \
+                            .replace(tzinfo=timezone.utc).timestamp()
+                    except ValueError:
+                        published_ts = time.time()
+                    conn.execute(
+                        'INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (h, url, title, art.get("description"), art.get("content"),
+                         (art.get("source") or {}).get("name"), published_at, published_ts,
+                         time.time(), cluster, array("Q", signature).tobytes())
+                    )
+                    conn.execute(
+                        'INSERT INTO articles_fts (url_hash, title, description, content) VALUES (?, ?, ?, ?)',
+                        (h, title, art.get("description"), art.get("content"))
+                    )
+                    self._add_to_bands(h, signature)
+                    added += 1
+                conn.commit()
+            finally:
+                conn.close()
+        return added
+
+    def add_translation(self, url, title_es=None, content_es=None):
+        """Añade al índice el titular y/o el cuerpo traducidos al español de un artículo."""
+        h = url_hash(url)
+        with self._lock:
+            conn = self._connect()
+            try:
+                if title_es:
+                    conn.execute('UPDATE articles_fts SET title_es = ? WHERE url_hash = ?', (title_es, h))
+                if content_es:
+                    conn.execute('UPDATE articles_fts SET content_es = ? WHERE url_hash = ?', (content_es, h))
+                conn.commit()
+            finally:
+                conn.close()
+
+    # ---------- cuerpos extraídos ----------
+    def get_body(self, url):
+        """Cuerpo guardado de `url` como {"content", "content_es", "fetched_at"}, o None."""
+        h = url_hash(url)
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT content, content_es, fetched_at FROM article_bodies WHERE url_hash = ?', (h,)
+            ).fetchone()
+            if row is not None:
+                conn.execute('UPDATE article_bodies SET last_access = ? WHERE url_hash = ?', (time.time(), h))
+                conn.commit()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+
+    def store_body(self, url, content, content_es):
+        """Guarda el cuerpo extraído y traducido de `url` y aplica el límite de tamaño."""
+        now = time.time()
+        size = len((content or "").encode("utf-8")) + len((content_es or "").encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO article_bodies VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (url_hash(url), url, content, content_es, size, now, now)
+                )
+                self._evict_bodies(conn)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _evict_bodies(self, conn):
+        """Borra los cuerpos usados hace más tiempo hasta quedar bajo ARTICLE_CACHE_MAX_BYTES."""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM article_bodies').fetchone()[0]
+        if total <= ARTICLE_CACHE_MAX_BYTES:
+            return
+        evicted = []
+        for row in conn.execute('SELECT url_hash, size FROM article_bodies ORDER BY last_access'):
+            if total <= ARTICLE_CACHE_MAX_BYTES:
+                break
+            evicted.append((row["url_hash"],))
+            total -= row["size"]
+        conn.executemany('DELETE FROM article_bodies WHERE url_hash = ?', evicted)
+
+    # ---------- consultas ----------
+    def recent(self, since_ts, limit=None, distinct=True):
+        """
+        Artículos publicados desde `since_ts`, del más reciente al más antiguo.
+        Con `distinct`, uno por cluster (el primero publicado dentro del periodo).
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                'SELECT * FROM articles WHERE published_ts >= ? ORDER BY published_ts', (since_ts,)
+            ).fetchall()
+        finally:
+            conn.close()
+        if distinct:
+            first_by_cluster = {}
+            for row in rows:
+                first_by_cluster.setdefault(row["cluster"], row)
+            rows = list(first_by_cluster.values())
+        rows = [dict(r) for r in reversed(rows)]
+        return rows[:limit] if limit else rows
+
+    def search(self, text, limit=SEARCH_CANDIDATES):
+        """
+        Artículos del índice que mejor casan con `text` (en inglés o español),
+        del mejor al peor. Cada uno lleva `rank` (bm25 de FTS5) y `coverage`:
+        la fracción de palabras de su titular (EN o ES) presentes en el texto.
+        """
+        terms = list(dict.fromkeys(search_terms(text)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        # Cada palabra como prefijo entre comillas (tolera plurales y conjugaciones)
+        query = " OR ".join(f'"{t[:max(4, len(t) - 2)]}"*' for t in terms)
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+                SELECT a.*, f.title_es, bm25(articles_fts, 0, 10.0, 3.0, 1.0, 10.0, 1.0) AS rank
+                FROM articles_fts f JOIN articles a ON a.url_hash = f.url_hash
+                WHERE articles_fts MATCH ?
+                ORDER BY rank LIMIT ?
+            ''', (query, limit)).fetchall()
+        finally:
+            conn.close()
+        results = []
+        for row in rows:
+            item = dict(row)
+            item["coverage"] = max(_coverage(item["title"], terms), _coverage(item["title_es"], terms))
+            results.append(item)
+        results.sort(key=lambda r: (-r["coverage"], r["rank"]))
+        return results
+
+    def find_article(self, text, min_coverage=NEWS_SEARCH_MIN_COVERAGE):
+        """Artículo del que con más probabilidad habla `text`, o None."""
+        results = self.search(text)
+        if results and results[0]["coverage"] >= min_coverage:
+            return results[0]
+        return None
+
+    def prune(self, before_ts):
+        """Borra los artículos publicados antes de `before_ts` (también de las bandas LSH)."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                for row in conn.execute(
+                    'SELECT url_hash, signature FROM articles WHERE published_ts < ? AND signature IS NOT NULL',
+                    (before_ts,)
+                ).fetchall():
+                    self._remove_from_bands(row["url_hash"], array("Q", row["signature"]).tolist())
+                conn.execute(
+                    'DELETE FROM articles_fts WHERE url_hash IN '
+                    '(SELECT url_hash FROM articles WHERE published_ts < ?)', (before_ts,)
+                )
+                conn.execute('DELETE FROM articles WHERE published_ts < ?', (before_ts,))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def last_ingest_age(self):
+        last = self.get_state("last_ingest")
+        return time.time() - float(last) if last else None
+
+# Almacén compartido de noticias
+NEWS_STORE = NewsStore()
+_INGEST_LOCK = threading.Lock()
+
+def ingest_once(store=NEWS_STORE):
+    """
+    Pide a NewsAPI solo lo publicado desde el cursor (fecha del artículo más
+    nuevo ya visto) y guarda los artículos nuevos. Devuelve cuántos entraron.
+    NewsAPI devuelve primero lo más nuevo: si no da tiempo a leer todas las
+    páginas, el cursor no avanza y la siguiente ingesta sigue por el hueco
+    pendiente (de lo más viejo ya leído hacia atrás) antes de pedir lo nuevo.
+    """
+    with _INGEST_LOCK:
+        now = datetime.now(timezone.utc)
+        cursor = store.get_state("cursor") or (now - INITIAL_LOOKBACK).strftime(NEWSAPI_TIME_FORMAT)
+        # Hueco pendiente de una ingesta anterior que no llegó hasta el cursor
+        upper = store.get_state("resume_to") or now.strftime(NEWSAPI_TIME_FORMAT)
+        newest = store.get_state("pending_newest") or cursor
+        oldest = None
+        exhausted = False
+        added = 0
+        for page in range(1, NEWS_INGEST_MAX_PAGES + 1):
+            if not QUOTA.try_acquire(PROVIDER_NEWSAPI, "everything"):
+                logging.warning("[Noticias] Presupuesto diario de NewsAPI agotado; ingesta aplazada")
+                break
+            params = {
+                "apiKey": NEWS_API_KEY,
+                "q": NEWS_QUERY,
+                "from": cursor,
+                "to": upper,
+                "language": "en",
+                "sortBy": "publishedAt",
+                "pageSize": PAGE_SIZE,
+                "page": page,
+            }
+            try:
+                resp = requests.get(f"{NEWS_API_BASE}/everything", params=params, timeout=10)
+                resp.raise_for_status()
+                data = resp.json()
+            except Exception as e:
+                logging.error("Error en la ingesta de NewsAPI: %s", e)
+                break
+            if data.get("status") != "ok":
+                logging.error("Error en la respuesta de NewsAPI: %s", data)
+                break
+            articles = data.get("articles", [])
+            added += store.add_articles(articles)
+            dates = [a.get("publishedAt") for a in articles if a.get("publishedAt")]
+            if dates:
+                newest = max([newest] + dates)
+                oldest = min([oldest] + dates) if oldest else min(dates)
+            if len(articles) < PAGE_SIZE:
+                exhausted = True
+                break
+        if exhausted:
+            # Todo leído hasta el cursor: avanza (es inclusivo, lo repetido se descarta por URL)
+            store.set_state("cursor", newest)
+            store.set_state("resume_to", "")
+            store.set_state("pending_newest", "")
+        elif oldest:
+            store.set_state("resume_to", oldest)
+            store.set_state("pending_newest", newest)
+            logging.info("[Noticias] Ingesta incompleta; se seguirá desde %s hacia %s", oldest, cursor)
+        store.set_state("last_ingest", str(time.time()))
+        store.prune(time.time() - NEWS_RETENTION_DAYS * 86400)
+        if added:
+            logging.info("[Noticias] %d artículos nuevos (cursor %s)", added, store.get_state("cursor"))
+        return added
+
+def ensure_fresh(store=NEWS_STORE, max_age=NEWS_INGEST_INTERVAL):
+    """Ingiere si la última ingesta es más vieja que `max_age` (para cuando no corre el hilo)."""
+    age = store.last_ingest_age()
+    if age is None or age >= max_age:
+        ingest_once(store)
+
+def news_ingest_loop():
+    while True:
+        try:
+            ingest_once()
+        except Exception as e:
+            logging.error("Error en el bucle de ingesta de noticias: %s", e)
+        # Si el consumo de NewsAPI va por encima del presupuesto, se espacian las ingestas
+        time.sleep(NEWS_INGEST_INTERVAL * QUOTA.ttl_factor(PROVIDER_NEWSAPI))
+
+_ingester_started = False
+
+def start_news_ingester():
+    """Inicia (una sola vez) el hilo que ingiere noticias cada NEWS_INGEST_INTERVAL segundos."""
+    global _ingester_started
+    with _INGEST_LOCK:
+        if _ingester_started:
+            return
+        _ingester_started = True
+    threading.Thread(target=news_ingest_loop, daemon=True).start()
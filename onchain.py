@@ -5,7 +5,20 @@ import logging
 import time
 from datetime import datetime, timedelta
 
-from config import COINMARKETCAP_API_KEY  # Asegúrate de que existan en config.py
+from config import (  # Asegúrate de que existan en config.py
+    COINMARKETCAP_API_KEY,
+    COINMARKETCAP_API_BASE,
+    COINGECKO_API_BASE,
+    BLOCKCHAIN_INFO_API_BASE,
+    ONCHAIN_TTL_CMC_QUOTES,
+    ONCHAIN_TTL_HASHRATE,
+    ONCHAIN_TTL_COINGECKO,
+    ONCHAIN_FETCH_DEADLINE,
+)
+from swr_cache import SWRCache
+from global_metrics import GLOBAL_METRICS_CACHE
+from api_quota import PROVIDER_CMC, PROVIDER_COINGECKO
+from timeseries import record_sample
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,7 +39,7 @@ def fetch_cmc_quotes_latest(symbol: str = "BTC") -> dict:
       - volume_24h_usd
     Devuelve campos None si falla o no están disponibles.
     """
-    url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
+    url = f"{COINMARKETCAP_API_BASE}/v1/cryptocurrency/quotes/latest"
     params = {"symbol": symbol, "convert": "USD"}
 
     try:
@@ -51,34 +64,6 @@ def fetch_cmc_quotes_latest(symbol: str = "BTC") -> dict:
     }
 
 
-def fetch_cmc_global_metrics() -> dict:
-    """
-    Llama a /v1/global-metrics/quotes/latest de CoinMarketCap para obtener:
-      - btc_dominance
-    Devuelve None si falla o no está disponible.
-    """
-    url = "https://pro-api.coinmarketcap.com/v1/global-metrics/quotes/latest"
-    params = {"convert": "USD"}
-
-    try:
-        resp = requests.get(url, headers=CMC_HEADERS, params=params, timeout=10)
-        resp.raise_for_status()
-        gm = resp.json().get("data", {})
-
-        return {
-            "btc_dominance": gm.get("btc_dominance")
-        }
-    except requests.exceptions.HTTPError as http_err:
-        status = resp.status_code if "resp" in locals() else None
-        logging.error(f"CMC global metrics HTTP {status}: {http_err}")
-    except Exception as e:
-        logging.error(f"Error al obtener CMC global metrics: {e}")
-
-    return {
-        "btc_dominance": None
-    }
-
-
 def fetch_coingecko_market_data() -> dict:
     """
     Consulta CoinGecko para obtener:
@@ -89,7 +74,7 @@ def fetch_coingecko_market_data() -> dict:
       - total_supply
     Devuelve todos los campos None en caso de error.
     """
-    url = "https://api.coingecko.com/api/v3/coins/bitcoin"
+    url = f"{COINGECKO_API_BASE}/coins/bitcoin"
     params = {
         "localization": "false",
         "tickers": "false",
@@ -134,7 +119,7 @@ def fetch_blockchain_hashrate() -> float:
     Consulta Blockchain.info para obtener el hashrate (último dato).
     Devuelve None en caso de error.
     """
-    url = "https://api.blockchain.info/charts/hash-rate?format=json"
+    url = f"{BLOCKCHAIN_INFO_API_BASE}/charts/hash-rate?format=json"
     try:
         resp = requests.get(url, timeout=10)
         resp.raise_for_status()
@@ -146,15 +131,57 @@ def fetch_blockchain_hashrate() -> float:
     return None
 
 
-def fetch_onchain_stats() -> dict:
+def _fetch_hashrate_fields() -> dict:
+    return {"hashrate": fetch_blockchain_hashrate()}
+
+
+def _has_data(values: dict) -> bool:
+    return any(v is not None for v in values.values())
+
+
+def _recorded(fetch):
+    """Envuelve una fuente para guardar en la serie local cada respuesta con datos."""
+    def fetch_and_record():
+        values = fetch()
+        if _has_data(values):
+            record_sample(values)
+        return values
+    return fetch_and_record
+
+
+# Fuentes on-chain: cache con TTL según lo volátil de sus campos, y campos que aporta
+ONCHAIN_SOURCES = {
+    "cmc_quotes": (SWRCache("cmc_quotes", _recorded(lambda: fetch_cmc_quotes_latest("BTC")),
+                            ttl=ONCHAIN_TTL_CMC_QUOTES, is_valid=_has_data, provider=PROVIDER_CMC),
+                   ("marketcap_usd", "volume_24h_usd")),
+    # Compartida con market.fetch_btc_dominance (una sola consulta a CMC por cadencia)
+    "cmc_global": (GLOBAL_METRICS_CACHE,
+                   ("btc_dominance", "eth_dominance", "others_dominance",
+                    "total_marketcap_usd", "total_volume_24h_usd")),
+    "hashrate": (SWRCache("hashrate", _recorded(_fetch_hashrate_fields),
+                          ttl=ONCHAIN_TTL_HASHRATE, is_valid=_has_data),
+                 ("hashrate",)),
+    # CMC en el plan actual no da high/low/ath/supply: siempre de CoinGecko
+    "coingecko": (SWRCache("coingecko_bitcoin", _recorded(fetch_coingecko_market_data),
+                           ttl=ONCHAIN_TTL_COINGECKO, is_valid=_has_data, provider=PROVIDER_COINGECKO),
+                  ("high_24h_usd", "low_24h_usd", "ath_price_usd", "circulating_supply", "total_supply")),
+}
+
+
+def fetch_onchain_stats(deadline: float = ONCHAIN_FETCH_DEADLINE) -> dict:
     """
     Combina:
       1) CMC quotes/latest para marketcap_usd y volume_24h_usd
-      2) CMC global metrics para btc_dominance
+      2) Métricas globales de CMC (global_metrics.py) para dominancias,
+         total_marketcap_usd y total_volume_24h_usd
       3) Blockchain.info para hashrate
       4) CoinGecko para high_24h_usd, low_24h_usd, ath_price_usd,
          circulating_supply, total_supply
 
+    Cada fuente tiene su propia cache stale-while-revalidate (TTL ONCHAIN_TTL_*):
+    las caducadas se refrescan todas a la vez y solo se espera (como mucho
+    `deadline` segundos) a las que aún no tienen un valor servible.
+
     Campos devueltos:
       - marketcap_usd
       - volume_24h_usd
@@ -164,43 +191,31 @@ def fetch_onchain_stats() -> dict:
       - circulating_supply
       - total_supply
       - btc_dominance
+      - eth_dominance
+      - others_dominance
+      - total_marketcap_usd
+      - total_volume_24h_usd
       - hashrate
+      - staleness: {campo: {"age_s": segundos desde que se obtuvo (None si nunca),
+                            "stale": True si superó el TTL de su fuente}}
     """
-    stats = {
-        "marketcap_usd": None,
-        "volume_24h_usd": None,
-        "high_24h_usd": None,
-        "low_24h_usd": None,
-        "ath_price_usd": None,
-        "circulating_supply": None,
-        "total_supply": None,
-        "btc_dominance": None,
-        "hashrate": None
-    }
-
-    # 1) CMC quotes/latest
-    cmc_q = fetch_cmc_quotes_latest("BTC")
-    stats.update(cmc_q)
-
-    # 2) CMC global metrics
-    cmc_gm = fetch_cmc_global_metrics()
-    stats.update(cmc_gm)
-
-    # 3) Hashrate de Blockchain.info
-    stats["hashrate"] = fetch_blockchain_hashrate()
-
-    # 4) Siempre obtenemos high/low/ath/supply de CoinGecko, 
-    #    ya que CMC en el plan actual no da esos datos históricos.
-    cg = fetch_coingecko_market_data()
-    for key in [
-        "high_24h_usd",
-        "low_24h_usd",
-        "ath_price_usd",
-        "circulating_supply",
-        "total_supply"
-    ]:
-        stats[key] = cg.get(key)
-
+    # Lanzar primero todos los refrescos necesarios para que corran en paralelo
+    for cache, _fields in ONCHAIN_SOURCES.values():
+        cache.revalidate()
+
+    started = time.time()
+    stats = {}
+    staleness = {}
+    for cache, fields in ONCHAIN_SOURCES.values():
+        result = cache.lookup(wait=max(deadline - (time.time() - started), 0))
+        values = result.value or {}
+        for key in fields:
+            stats[key] = values.get(key)
+            staleness[key] = {
+                "age_s": round(result.age, 1) if result.age is not None else None,
+                "stale": result.stale,
+            }
+    stats["staleness"] = staleness
     return stats
 
 
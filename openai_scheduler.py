@@ -0,0 +1,266 @@
+# openai_scheduler.py
+
+import time
+import queue
+import heapq
+import random
+import logging
+import itertools
+import threading
+from collections import deque
+
+import openai
+
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_API_BASE,
+    OPENAI_RATE_LIMIT,
+    OPENAI_TOKENS_PER_MINUTE,
+    OPENAI_MAX_CONCURRENCY,
+    OPENAI_MAX_RETRIES,
+    OPENAI_REQUEST_TIMEOUT,
+    OPENAI_HEDGE_ENABLED,
+    OPENAI_HEDGE_AFTER,
+    OPENAI_HEDGE_MODEL,
+    OPENAI_FIRST_TOKEN_DEADLINE,
+)
+
+openai.api_key = OPENAI_API_KEY
+openai.api_base = OPENAI_API_BASE
+
+# Prioridades: menor número = se atiende antes
+PRIORITY_INTERACTIVE = 0   # preguntas de usuarios en Telegram
+PRIORITY_SCHEDULED = 1     # tareas programadas y envíos automáticos
+
+# Errores de OpenAI que merecen reintento (429 y 5xx / red)
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.APIError,
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+)
+
+def estimate_tokens(messages, max_tokens=0):
+    """Estimación rápida de tokens: ~4 caracteres por token más la respuesta máxima."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + max_tokens
+
+class OpenAIScheduler:
+    """
+    Punto único para todas las llamadas a ChatCompletion:
+      - respeta un máximo de peticiones y de tokens por minuto (ventana deslizante)
+      - limita las llamadas simultáneas
+      - atiende primero las peticiones de mayor prioridad (interactivas)
+      - reintenta 429/5xx con backoff exponencial
+    """
+    def __init__(self, requests_per_minute=OPENAI_RATE_LIMIT, tokens_per_minute=OPENAI_TOKENS_PER_MINUTE,
+                 max_concurrency=OPENAI_MAX_CONCURRENCY, max_retries=OPENAI_MAX_RETRIES):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._cond = threading.Condition()
+        self._waiting = []              # heap de (prioridad, secuencia)
+        self._seq = itertools.count()
+        self._active = 0
+        self._requests = deque()        # timestamps de peticiones del último minuto
+        self._tokens = deque()          # [timestamp, tokens] del último minuto
+
+    def _budget_wait(self, tokens, now):
+        """Segundos a esperar hasta que haya presupuesto de peticiones y tokens."""
+        while self._requests and now - self._requests[0] >= 60:
+            self._requests.popleft()
+        while self._tokens and now - self._tokens[0][0] >= 60:
+            self._tokens.popleft()
+
+        wait_s = 0.0
+        if len(self._requests) >= self.requests_per_minute:
+            wait_s = max(wait_s, 60 - (now - self._requests[0]))
+        used = sum(t for _, t in self._tokens)
+        if self._tokens and used + tokens > self.tokens_per_minute:
+            # Esperar a que caduquen suficientes entradas antiguas
+            freed = 0
+            for ts, t in self._tokens:
+                freed += t
+                if used - freed + tokens <= self.tokens_per_minute:
+                    wait_s = max(wait_s, 60 - (now - ts))
+                    break
+            else:
+                wait_s = max(wait_s, 60 - (now - self._tokens[-1][0]))
+        return wait_s
+
+    def _acquire(self, priority, tokens):
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                if self._waiting[0] == ticket and self._active < self.max_concurrency:
+                    now = time.time()
+                    wait_s = self._budget_wait(tokens, now)
+                    if wait_s <= 0:
+                        heapq.heappop(self._waiting)
+                        self._active += 1
+                        self._requests.append(now)
+                        entry = [now, tokens]
+                        self._tokens.append(entry)
+                        self._cond.notify_all()
+                        return entry
+                    self._cond.wait(wait_s)
+                else:
+                    self._cond.wait()
+
+    def _release(self, entry=None, used_tokens=None):
+        with self._cond:
+            self._active -= 1
+            if entry is not None and used_tokens is not None:
+                entry[1] = used_tokens
+            self._cond.notify_all()
+
+    def _stream(self, response, entry):
+        """Mantiene ocupada la plaza de concurrencia mientras se consume el stream."""
+        try:
+            for chunk in response:
+                yield chunk
+        finally:
+            self._release(entry)
+
+    def chat_completion(self, messages, model="gpt-4", priority=PRIORITY_INTERACTIVE, **kwargs):
+        """
+        Equivalente a openai.ChatCompletion.create(model=..., messages=..., **kwargs)
+        pero pasando por el planificador. Con stream=True devuelve un generador.
+        Cada petición HTTP tiene como máximo OPENAI_REQUEST_TIMEOUT segundos.
+        """
+        kwargs.setdefault("request_timeout", OPENAI_REQUEST_TIMEOUT)
+        tokens = estimate_tokens(messages, kwargs.get("max_tokens", 0))
+        attempt = 0
+        while True:
+            entry = self._acquire(priority, tokens)
+            try:
+                response = openai.ChatCompletion.create(model=model, messages=messages, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                self._release(entry)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+                logging.warning(f"[OpenAI] {type(e).__name__}: reintento {attempt}/{self.max_retries} en {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            except Exception:
+                self._release(entry)
+                raise
+
+            if kwargs.get("stream"):
+                return self._stream(response, entry)
+            usage = response.get("usage", {}) if hasattr(response, "get") else {}
+            self._release(entry, usage.get("total_tokens"))
+            return response
+
+# Planificador compartido por todo el bot
+OPENAI_SCHEDULER = OpenAIScheduler()
+
+def chat_completion(messages, model="gpt-4", priority=PRIORITY_INTERACTIVE, **kwargs):
+    """Atajo a OPENAI_SCHEDULER.chat_completion."""
+    return OPENAI_SCHEDULER.chat_completion(messages, model=model, priority=priority, **kwargs)
+
+def _chain(first, stream):
+    """Vuelve a anteponer el primer chunk ya leído al resto del stream."""
+    try:
+        if first is not None:
+            yield first
+        for chunk in stream:
+            yield chunk
+    finally:
+        stream.close()
+
+def _discard_losers(results, pending, timeout):
+    """Cierra los streams de los intentos que perdieron la carrera (aunque lleguen tarde)."""
+    for _ in range(pending):
+        try:
+            label, stream, _first, _err = results.get(timeout=timeout)
+        except queue.Empty:
+            return
+        if stream is not None:
+            logging.info(f"[OpenAI] Cancelando intento '{label}' (perdió la carrera)")
+            stream.close()
+
+def hedged_chat_completion(messages, model="gpt-4", priority=PRIORITY_INTERACTIVE,
+                           hedge_model=OPENAI_HEDGE_MODEL, hedge_after=OPENAI_HEDGE_AFTER,
+                           first_token_deadline=OPENAI_FIRST_TOKEN_DEADLINE, **kwargs):
+    """
+    Pide la respuesta en modo stream y devuelve un generador de chunks.
+    Si el intento principal no produce su primer token en `hedge_after`
+    segundos (o falla), lanza un segundo intento con `hedge_model` y se
+    queda con el que responda primero; el otro se cancela. Si ninguno
+    produce el primer token antes de `first_token_deadline`, lanza
+    openai.error.Timeout.
+    """
+    kwargs.pop("stream", None)
+    results = queue.Queue()
+
+    def attempt(label, attempt_model):
+        try:
+            stream = chat_completion(messages, model=attempt_model, priority=priority, stream=True, **kwargs)
+            first = next(stream, None)
+        except Exception as e:
+            results.put((label, None, None, e))
+            return
+        results.put((label, stream, first, None))
+
+    def launch(label, attempt_model):
+        threading.Thread(target=attempt, args=(label, attempt_model), daemon=True).start()
+
+    start = time.time()
+    launch("principal", model)
+    pending = 1
+    hedged = not OPENAI_HEDGE_ENABLED
+    last_error = None
+    while pending:
+        elapsed = time.time() - start
+        timeout = first_token_deadline - elapsed
+        if not hedged:
+            timeout = min(timeout, hedge_after - elapsed)
+        try:
+            label, stream, first, err = results.get(timeout=max(timeout, 0))
+        except queue.Empty:
+            if hedged:
+                break
+            logging.info(f"[OpenAI] Sin primer token en {hedge_after}s; lanzando intento de cobertura con {hedge_model}")
+            launch("cobertura", hedge_model)
+            pending += 1
+            hedged = True
+            continue
+
+        pending -= 1
+        if err is not None:
+            logging.warning(f"[OpenAI] Intento '{label}' falló: {err}")
+            last_error = err
+            if not hedged:
+                launch("cobertura", hedge_model)
+                pending += 1
+                hedged = True
+            continue
+
+        if pending:
+            threading.Thread(
+                target=_discard_losers,
+                args=(results, pending, first_token_deadline + OPENAI_REQUEST_TIMEOUT),
+                daemon=True,
+            ).start()
+        logging.info(f"[OpenAI] Primer token de '{label}' en {time.time() - start:.1f}s")
+        return _chain(first, stream)
+
+    if pending:
+        threading.Thread(
+            target=_discard_losers,
+            args=(results, pending, OPENAI_REQUEST_TIMEOUT),
+            daemon=True,
+        ).start()
+    if last_error is not None and not pending:
+        raise last_error
+    raise openai.error.Timeout(f"OpenAI no respondió en {first_token_deadline}s")
+
+def collect_stream(chunks):
+    """Concatena el contenido de un stream de ChatCompletion."""
+    return "".join(chunk["choices"][0].get("delta", {}).get("content") or "" for chunk in chunks).strip()
@@ -0,0 +1,110 @@
+# prompt_builder.py
+
+import re
+from functools import lru_cache
+
+from config import PROMPT_TOKEN_BUDGET, PROMPT_MEMORY_MESSAGES
+from memoria import get_recent_message_rows
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken es opcional: si no está, se estima por caracteres
+    _ENCODING = None
+
+HIGGS_SYSTEM_PROMPT = (
+    "Eres Higgs X, agente de inteligencia infiltrado en la blockchain. "
+    "Analista mercantil y de noticias sobre Bitcoin (BTC). Tu misión es proteger "
+    "al equipo de pérdidas en Bitcoin, usando memoria de contexto. Responde "
+    "conciso, serio y misterioso con un toque creativo y firma como 'Higgs X'."
+)
+
+DEEP_INSTRUCTION = "Con esta información completa, proporciona un análisis detallado del estado actual del mercado."
+FAST_INSTRUCTION = "Responde en pocas líneas."
+
+# Palabras que no cuentan para decidir si un mensaje previo es relevante
+STOPWORDS = {
+    "que", "qué", "como", "cómo", "el", "la", "los", "las", "de", "del", "en", "un", "una",
+    "y", "o", "a", "al", "es", "por", "para", "con", "se", "lo", "me", "te", "mi", "tu",
+    "higgs", "ves", "hay", "esta", "está", "the", "is", "of", "to",
+}
+
+def count_tokens(text):
+    """Cuenta tokens localmente (tiktoken si está instalado; si no, ~4 caracteres por token)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(text) // 4 + 1
+
+@lru_cache(maxsize=8)
+def static_prefix_tokens(system_prompt):
+    """Tokens del prefijo fijo (system prompt); se calcula una sola vez por prompt."""
+    return count_tokens(system_prompt)
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Recorta `text` a `max_tokens` cortando en fin de frase cuando es posible.
+    Devuelve "" si no cabe ni una frase.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    result = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        candidate = f"{result} {sentence}".strip()
+        if count_tokens(candidate + " …") > max_tokens:
+            break
+        result = candidate
+    return f"{result} …" if result else ""
+
+def relevant_memory_block(question, limit=PROMPT_MEMORY_MESSAGES):
+    """
+    Mensajes recientes de memoria que comparten palabras clave con la pregunta,
+    en orden cronológico. Excluye la propia pregunta (ya guardada en memoria).
+    """
+    keywords = {w for w in re.findall(r"\w+", question.lower()) if len(w) > 2 and w not in STOPWORDS}
+    if not keywords:
+        return ""
+    lines = []
+    for ts, username, content in get_recent_message_rows(limit):
+        if content.strip() == question.strip():
+            continue
+        words = set(re.findall(r"\w+", content.lower()))
+        if keywords & words:
+            lines.append(f"[{ts}] {username}: {content}")
+    if not lines:
+        return ""
+    return "🧠 Conversación reciente relacionada:\n" + "\n".join(lines) + "\n"
+
+def build_messages(question, username, indicators_block="", onchain_block="", memory_block="",
+                   article="", instruction=DEEP_INSTRUCTION, budget=PROMPT_TOKEN_BUDGET,
+                   system_prompt=HIGGS_SYSTEM_PROMPT):
+    """
+    Arma los mensajes para ChatCompletion respetando `budget` tokens (system + user).
+    Se rellena por prioridad: pregunta, indicadores, on-chain, memoria relevante
+    y, con lo que sobre, la noticia recortada. Los bloques que no caben se omiten.
+    """
+    header = f"@{username}, aquí Higgs X al habla.\n\n"
+    footer = f"{instruction}\nPregunta: {question}"
+    remaining = budget - static_prefix_tokens(system_prompt) - count_tokens(header + footer)
+
+    included = {}
+    for name, block in (("indicators", indicators_block), ("onchain", onchain_block), ("memory", memory_block)):
+        if not block:
+            continue
+        cost = count_tokens(block + "\n")
+        if cost <= remaining:
+            included[name] = block + "\n"
+            remaining -= cost
+
+    prompt = header + "".join(included.get(n, "") for n in ("indicators", "onchain", "memory")) + footer
+    if article:
+        section_header = "\n\n📰 Ampliación:\n"
+        article_text = truncate_to_tokens(article, remaining - count_tokens(section_header))
+        if article_text:
+            prompt += section_header + article_text
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
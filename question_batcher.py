@@ -0,0 +1,143 @@
+# question_batcher.py
+
+import re
+import json
+import logging
+import threading
+
+from config import (
+    OPENAI_DEEP_MODEL,
+    OPENAI_FIRST_TOKEN_DEADLINE,
+    OPENAI_REQUEST_TIMEOUT,
+    QUESTION_BATCH_WINDOW,
+    QUESTION_BATCH_MAX,
+)
+from openai_scheduler import hedged_chat_completion, collect_stream, PRIORITY_INTERACTIVE
+from prompt_builder import HIGGS_SYSTEM_PROMPT, DEEP_INSTRUCTION
+
+# Tokens de respuesta por pregunta dentro de un lote (y tope total)
+BATCH_TOKENS_PER_QUESTION = 350
+BATCH_MAX_TOKENS = 2500
+
+class _PendingQuestion:
+    def __init__(self, question, username):
+        self.question = question
+        self.username = username
+        self.answer = None
+        self.started = threading.Event()   # el lote ya recibió su primer token
+        self.done = threading.Event()
+
+def _parse_answers(content):
+    """Extrae {id: respuesta} del JSON devuelto por el modelo (tolera texto alrededor)."""
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    answers = {}
+    for item in data.get("respuestas", []):
+        try:
+            answers[int(item["id"])] = str(item["respuesta"]).strip()
+        except (KeyError, TypeError, ValueError):
+            continue
+    return answers
+
+class QuestionBatcher:
+    """
+    Agrupa las preguntas que llegan dentro de una ventana corta en una sola
+    ChatCompletion que comparte el contexto de mercado. El modelo devuelve
+    las respuestas en JSON y cada hilo recibe la suya.
+    El lote pasa por hedged_chat_completion, con el mismo plazo de primer
+    token (OPENAI_FIRST_TOKEN_DEADLINE) y la misma cobertura que una consulta
+    suelta, así que una pregunta espera como mucho la ventana más ese plazo
+    a que el lote empiece a responder.
+    submit() devuelve None si la pregunta quedó sola en su ventana o si el
+    lote falló: en ese caso el llamador sigue por la vía normal.
+    """
+    def __init__(self, window=QUESTION_BATCH_WINDOW, max_size=QUESTION_BATCH_MAX, model=OPENAI_DEEP_MODEL):
+        self.window = window
+        self.max_size = max_size
+        self.model = model
+        self._lock = threading.Lock()
+        self._pending = []
+        self._context = ("", "")
+        self._generation = 0
+
+    def submit(self, question, username, indicators_block, onchain_block):
+        item = _PendingQuestion(question, username)
+        batch = None
+        with self._lock:
+            self._pending.append(item)
+            if len(self._pending) == 1:
+                # Primera pregunta de la ventana: su contexto es el compartido
+                self._context = (indicators_block, onchain_block)
+                threading.Timer(self.window, self._flush, args=(self._generation,)).start()
+            elif len(self._pending) >= self.max_size:
+                batch = self._take()
+        if batch:
+            threading.Thread(target=self._run_batch, args=batch, daemon=True).start()
+
+        # Hasta el primer token, el plazo de una consulta normal; después, lo que tarde el stream
+        if item.started.wait(self.window + OPENAI_FIRST_TOKEN_DEADLINE):
+            item.done.wait(OPENAI_REQUEST_TIMEOUT)
+        return item.answer
+
+    def _take(self):
+        """Saca el lote pendiente (llamar con el lock tomado)."""
+        items, context = self._pending, self._context
+        self._pending = []
+        self._generation += 1
+        return items, context
+
+    def _flush(self, generation):
+        with self._lock:
+            if generation != self._generation or not self._pending:
+                return  # el lote ya salió por tamaño máximo
+            items, context = self._take()
+        self._run_batch(items, context)
+
+    def _run_batch(self, items, context):
+        try:
+            if len(items) > 1:
+                self._answer_batch(items, context)
+        except Exception as e:
+            logging.error(f"[Lote GPT] Error al responder lote de {len(items)} preguntas: {e}")
+        finally:
+            for item in items:
+                item.started.set()
+                item.done.set()
+
+    def _answer_batch(self, items, context):
+        indicators_block, onchain_block = context
+        preguntas = "\n".join(
+            f"{i}. @{item.username}: {item.question}" for i, item in enumerate(items, start=1)
+        )
+        prompt = (
+            f"{indicators_block}\n{onchain_block}\n"
+            f"{DEEP_INSTRUCTION}\n"
+            "Responde a cada una de estas preguntas de forma independiente, empezando cada "
+            "respuesta con la mención al usuario (@usuario) y firmando como 'Higgs X':\n"
+            f"{preguntas}\n\n"
+            'Devuelve SOLO un JSON con el formato {"respuestas": [{"id": 1, "respuesta": "..."}]}.'
+        )
+        logging.info(f"[Lote GPT] Enviando {len(items)} preguntas en una sola petición")
+        chunks = hedged_chat_completion(
+            [
+                {"role": "system", "content": HIGGS_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            model=self.model,
+            priority=PRIORITY_INTERACTIVE,
+            max_tokens=min(BATCH_TOKENS_PER_QUESTION * len(items), BATCH_MAX_TOKENS),
+            temperature=0.7,
+        )
+        for item in items:
+            item.started.set()
+        answers = _parse_answers(collect_stream(chunks))
+        for i, item in enumerate(items, start=1):
+            item.answer = answers.get(i) or None
+
+# Instancia compartida por el handler de Telegram
+QUESTION_BATCHER = QuestionBatcher()
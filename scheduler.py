@@ -7,12 +7,16 @@ import threading
 import logging
 import requests
 
-from config import SYMBOL, TIMEFRAME, TELEGRAM_CHAT_ID
+from config import SYMBOL, TIMEFRAME, TELEGRAM_CHAT_ID, COINGECKO_API_BASE, ALTERNATIVE_ME_BASE, TOP_MOVERS_TTL
 from telegram_handler import send_telegram_message, send_telegram_photo
 from market import fetch_data
 from indicators import calculate_indicators
 from news import test_get_headlines
+from news_store import start_news_ingester
 from memoria import store_message
+from market_snapshot import get_snapshot, format_analysis_message
+from swr_cache import swr_cached
+from api_quota import PROVIDER_COINGECKO
 
 # Importar on-chain para marketcap y volumen
 from onchain import fetch_onchain_stats
@@ -46,8 +50,10 @@ def send_fng_image():
     Agrega un 'cache‐buster' para evitar versiones muy antiguas en caché.
     """
     ts = int(time.time())
-    fng_url = f"https://alternative.me/crypto/fear-and-greed-index.png?ts={ts}"
-    caption = f"📊 Fear & Greed Index (actualizado al {datetime.datetime.now(pytz.timezone('America/Caracas')).strftime('%d-%m-%Y %H:%M')})"
+    fng_url = f"{ALTERNATIVE_ME_BASE}/crypto/fear-and-greed-index.png?ts={ts}"
+    ahora = datetime.datetime.now(pytz.timezone('America/Caracas'))
+    caption = f"📊 Fear & Greed Index (actualizado al {ahora.strftime('%d-%m-%Y %H:%M')})"
+    # Se envía una vez al día con la imagen nueva: no hay file_id que reutilizar
     # Pasamos None como message_thread_id para que el caption se reconozca correctamente
     send_telegram_photo(fng_url, TELEGRAM_CHAT_ID, None, caption=caption)
     logging.info("Imagen Fear & Greed Index enviada.")
@@ -70,22 +76,12 @@ def send_market_open_message():
 
 def send_analysis_message():
     try:
-        data = fetch_data(SYMBOL, TIMEFRAME)
-        indicadores = calculate_indicators(data)
-        dominance_text = (
-            f"{indicadores.get('btc_dominance', 0):.2f}%"
-            if indicadores.get('btc_dominance') is not None else "N/D"
-        )
-        mensaje = (
-            f"📟Análisis Completado - Informe 1º:\n"
-            f"Precio BTC: ${indicadores.get('price', 0):.2f}\n"
-            f"RSI: {indicadores.get('rsi', 0):.2f}\n"
-            f"MACD: {indicadores.get('macd', 0):.2f} (Señal: {indicadores.get('macd_signal', 0):.2f})\n"
-            f"ADX: {indicadores.get('adx', 0):.2f}\n"
-            f"SMA: {indicadores.get('sma_10', 0):.2f} | {indicadores.get('sma_25', 0):.2f} | {indicadores.get('sma_50', 0):.2f}\n"
-            f"Volumen: {indicadores.get('volume_level', 'N/A')} (CMF: {indicadores.get('cmf', 0):.2f})\n\n"
-            f"BTC Dominancia: {dominance_text}"
-        )
+        snap = get_snapshot()
+        if snap is not None:
+            mensaje = snap.analysis_text
+        else:
+            data = fetch_data(SYMBOL, TIMEFRAME)
+            mensaje = format_analysis_message(calculate_indicators(data))
         send_telegram_message(mensaje, chat_id=TELEGRAM_CHAT_ID)
         logging.info("Mensaje de análisis enviado.")
         flush_logs()
@@ -274,6 +270,8 @@ def send_daily_1d_report():
         logging.error("Error en send_daily_1d_report: %s", e)
         flush_logs()
 
+@swr_cached("coingecko_top3", ttl=TOP_MOVERS_TTL, is_valid=lambda result: bool(result[0] and result[1]),
+            provider=PROVIDER_COINGECKO, default=([], []))
 def fetch_top3_gainers_losers() -> tuple[list, list]:
     """
     Usa CoinGecko para obtener el top 100 de monedas según MarketCap y
@@ -282,7 +280,7 @@ def fetch_top3_gainers_losers() -> tuple[list, list]:
       - top3_losers:  [(symbol, change_pct_24h), ...]
     """
     try:
-        url = "https://api.coingecko.com/api/v3/coins/markets"
+        url = f"{COINGECKO_API_BASE}/coins/markets"
         params = {
             "vs_currency": "usd",
             "order": "market_cap_desc",
@@ -352,6 +350,7 @@ def scheduler_loop():
     global last_market_open_day, last_morning_day, last_evening_day, last_weekend_day
     global last_daily_report, last_top3_report, last_fng_day
 
+    start_news_ingester()
     venezuela_tz = pytz.timezone("America/Caracas")
     while True:
         now = datetime.datetime.now(venezuela_tz)
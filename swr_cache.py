@@ -0,0 +1,215 @@
+# swr_cache.py
+
+import time
+import inspect
+import logging
+import threading
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+from config import SWR_MAX_STALE_FACTOR
+from api_quota import QUOTA
+
+# Pool compartido para los refrescos en segundo plano
+_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="swr")
+# Todas las caches creadas, por nombre (para cache_health)
+SWR_CACHES = {}
+
+class CacheResult:
+    """Valor servido por SWRCache junto con su antigüedad."""
+    __slots__ = ("value", "age", "stale")
+
+    def __init__(self, value, age, stale):
+        self.value = value
+        self.age = age          # segundos desde que se obtuvo (None si nunca hubo valor bueno)
+        self.stale = stale      # True si superó el TTL (se está revalidando)
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "last_result", "future")
+
+    def __init__(self):
+        self.value = None           # último valor bueno
+        self.fetched_at = None
+        self.last_result = None     # último resultado, aunque no fuera válido
+        self.future = None          # refresco en curso
+
+class SWRCache:
+    """
+    Cache stale-while-revalidate para una función `fetch(*args)`:
+      - dentro de `ttl` devuelve el valor guardado sin red
+      - entre `ttl` y `max_stale` devuelve el valor guardado al instante
+        y lo refresca en segundo plano
+      - sin valor o pasado `max_stale` espera al refresco (como mucho `wait` s)
+      - varios llamadores con la misma clave comparten un único refresco
+    Un resultado cuenta como bueno si `is_valid(resultado)` (por defecto, no
+    None y sin excepción). Si el refresco falla se mantiene el último valor
+    bueno; si no lo hay (o es demasiado viejo) se devuelve el propio
+    resultado fallido de `fetch`, igual que sin cache, o `default` si no hay
+    ni eso (p. ej. la llamada se rechazó por cuota o el refresco no llegó a
+    tiempo).
+    Con `provider`, cada llamada se descuenta de su cuota (api_quota.QUOTA):
+    sin presupuesto no se llama y se sigue sirviendo el valor guardado, y
+    los TTL se alargan según lo apurado que vaya el presupuesto del día.
+    """
+    def __init__(self, name, fetch, ttl, max_stale=None, is_valid=None, wait=None, max_entries=None,
+                 provider=None, default=None):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale if max_stale is not None else ttl * SWR_MAX_STALE_FACTOR
+        self.is_valid = is_valid or (lambda value: value is not None)
+        self.wait = wait
+        self.max_entries = max_entries
+        self.provider = provider
+        self.default = default
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Salud de la fuente
+        self.last_success = None
+        self.last_error = None
+        self.consecutive_failures = 0
+        SWR_CACHES[name] = self
+
+    def _limits(self):
+        """(ttl, max_stale) efectivos, alargados si la cuota del proveedor va justa."""
+        factor = QUOTA.ttl_factor(self.provider) if self.provider else 1.0
+        return self.ttl * factor, self.max_stale * factor
+
+    def _refresh(self, key, entry):
+        result = None
+        error = None
+        fetched = False
+        try:
+            if self.provider and not QUOTA.try_acquire(self.provider, self.name):
+                error = "cuota agotada"
+            else:
+                fetched = True
+                result = self.fetch(*key)
+                if not self.is_valid(result):
+                    error = f"resultado no válido: {str(result)[:80]}"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        with self._lock:
+            if fetched:
+                # Sin llamada (cuota agotada) se conserva el último resultado que hubiera
+                entry.last_result = result
+            entry.future = None
+            if error is None:
+                entry.value = result
+                entry.fetched_at = time.time()
+                self.last_success = entry.fetched_at
+                self.consecutive_failures = 0
+            else:
+                self.last_error = error
+                self.consecutive_failures += 1
+        if error is not None:
+            logging.warning(f"[Cache {self.name}] Refresco fallido ({self.consecutive_failures} seguidos): {error}")
+        return result
+
+    def _start_refresh(self, key):
+        """Lanza el refresco de `key` si no hay uno en curso (llamar con el lock tomado)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            if self.max_entries and len(self._entries) >= self.max_entries:
+                self._evict_oldest()
+            entry = self._entries[key] = _Entry()
+        if entry.future is None:
+            entry.future = _REFRESH_EXECUTOR.submit(self._refresh, key, entry)
+        return entry.future
+
+    def _evict_oldest(self):
+        """Quita la entrada más antigua sin refresco en curso (llamar con el lock tomado)."""
+        idle = [(e.fetched_at or 0, k) for k, e in self._entries.items() if e.future is None]
+        if idle:
+            del self._entries[min(idle)[1]]
+
+    def revalidate(self, *args):
+        """Lanza en segundo plano el refresco de `args` si hace falta, sin esperar."""
+        ttl, _max_stale = self._limits()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(args)
+            if entry is None or entry.fetched_at is None or now - entry.fetched_at >= ttl:
+                return self._start_refresh(args)
+        return None
+
+    def lookup(self, *args, wait=None):
+        """Como get() pero devuelve un CacheResult con la antigüedad del dato."""
+        if wait is None:
+            wait = self.wait
+        ttl, max_stale = self._limits()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(args)
+            age = now - entry.fetched_at if entry and entry.fetched_at is not None else None
+            if age is not None and age < ttl:
+                return CacheResult(entry.value, age, False)
+            future = self._start_refresh(args)
+            if age is not None and age < max_stale:
+                return CacheResult(entry.value, age, True)
+            entry = self._entries[args]
+
+        wait_futures([future], timeout=wait)
+        with self._lock:
+            age = time.time() - entry.fetched_at if entry.fetched_at is not None else None
+            if age is not None and age < max_stale:
+                return CacheResult(entry.value, age, age >= ttl)
+            value = entry.last_result if entry.last_result is not None else self.default
+            return CacheResult(value, age, True)
+
+    def get(self, *args, wait=None):
+        """Valor para `args` según la política stale-while-revalidate."""
+        return self.lookup(*args, wait=wait).value
+
+    def invalidate(self, *args):
+        with self._lock:
+            self._entries.pop(args, None)
+
+    def health(self):
+        """Estado de la fuente: último éxito, último error y fallos seguidos."""
+        now = time.time()
+        with self._lock:
+            ages = [now - e.fetched_at for e in self._entries.values() if e.fetched_at is not None]
+        return {
+            "ok": self.consecutive_failures == 0 and self.last_success is not None,
+            "last_success_age_s": round(now - self.last_success, 1) if self.last_success else None,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "oldest_value_age_s": round(max(ages), 1) if ages else None,
+            "entries": len(ages),
+        }
+
+def swr_cached(name, ttl, max_stale=None, is_valid=None, wait=None, max_entries=None, provider=None,
+               default=None):
+    """
+    Decorador: la función pasa a servirse desde una SWRCache (clave = sus
+    argumentos, con los valores por defecto aplicados). La función original
+    queda en `.fetch_fresh` y la cache en `.cache`.
+    """
+    def decorator(fetch):
+        cache = SWRCache(name, fetch, ttl, max_stale=max_stale, is_valid=is_valid, wait=wait,
+                         max_entries=max_entries, provider=provider, default=default)
+        signature = inspect.signature(fetch)
+
+        @wraps(fetch)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return cache.get(*bound.args)
+        wrapper.fetch_fresh = fetch
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+def cache_health():
+    """Salud de todas las fuentes cacheadas: {nombre: health()}."""
+    return {name: cache.health() for name, cache in SWR_CACHES.items()}
+
+def log_cache_health():
+    """Registra en el log las fuentes con fallos."""
+    for name, health in cache_health().items():
+        if not health["ok"]:
+            logging.warning(
+                f"[Cache {name}] Fuente degradada: {health['consecutive_failures']} fallos seguidos, "
+                f"último error: {health['last_error']}, dato más viejo: {health['oldest_value_age_s']}s"
+            )
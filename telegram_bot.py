@@ -1,21 +1,36 @@
 import asyncio
 import time
+from config import TELEGRAM_MAX_CONCURRENT_UPDATES
 from telegram_handler import get_updates, handle_telegram_message
 
+async def handle_update(semaphore, update):
+    """Procesa una actualización en el pool de hilos (como mucho tantas a la vez como permita el semáforo)."""
+    update_id = update.get("update_id")
+    async with semaphore:
+        print(f"[Telegram Bot] Procesando actualización con ID: {update_id}")  # Log del ID de la actualización
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, handle_telegram_message, update)
+        except Exception as e:
+            print(f"[Telegram Bot] Error al procesar la actualización {update_id}: {e}")
+
 async def process_updates(semaphore):
     offset = None  # Inicializa el offset para evitar mensajes duplicados
+    in_flight = {}  # update_id -> tarea, para no lanzar dos veces la misma actualización
     while True:
         try:
             updates = get_updates(offset)
             print(f"[Telegram Bot] Recibidos {len(updates)} actualizaciones")  # Log del número de actualizaciones recibidas
-            if updates:
-                for update in updates:
-                    update_id = update.get("update_id")
-                    print(f"[Telegram Bot] Procesando actualización con ID: {update_id}")  # Log del ID de la actualización
-                    async with semaphore:
-                        loop = asyncio.get_running_loop()
-                        await loop.run_in_executor(None, handle_telegram_message, update)
-                    offset = update_id + 1  # Actualiza el offset para futuros mensajes
+            for update in updates:
+                update_id = update.get("update_id")
+                if update_id not in in_flight:
+                    in_flight[update_id] = asyncio.create_task(handle_update(semaphore, update))
+            # El offset solo avanza sobre actualizaciones ya terminadas, en orden
+            for update_id in sorted(in_flight):
+                if not in_flight[update_id].done():
+                    break
+                del in_flight[update_id]
+                offset = update_id + 1  # Actualiza el offset para futuros mensajes
             await asyncio.sleep(3)
         except Exception as e:
             print(f"[Telegram Bot] Error en el bucle del bot: {e}")
@@ -25,9 +40,10 @@ def telegram_bot_loop(message=None):
 
     """
     Bucle principal para escuchar mensajes de Telegram de forma asíncrona.
-    Se utiliza un semáforo para limitar las actualizaciones procesadas simultáneamente.
+    Cada actualización se procesa en su propia tarea; un semáforo limita
+    cuántas se procesan simultáneamente.
     """
-    semaphore = asyncio.Semaphore(5)
+    semaphore = asyncio.Semaphore(TELEGRAM_MAX_CONCURRENT_UPDATES)
     
     # Si se pasa un mensaje, procesarlo
     if message:
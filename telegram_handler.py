@@ -3,101 +3,304 @@
 # ------------------
 import re
 import requests
-import openai
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import cached_property
 from langdetect import detect
 
 from config import (
     TELEGRAM_TOKEN,
     TELEGRAM_CHAT_ID,
     TELEGRAM_HIGGS_THREAD_ID,
-    OPENAI_API_KEY,
     SYMBOL,
     TIMEFRAME,
+    CONTEXT_DEADLINE_SECONDS,
+    OPENAI_STREAMING,
+    QUESTION_BATCHING,
+    TELEGRAM_EDIT_INTERVAL,
+    TELEGRAM_API_BASE,
+    PHOTO_FILE_ID_CACHE_SIZE,
 )
 from market import fetch_data
 from indicators import calculate_indicators
-from memoria import store_message, add_task
+from memoria import store_message, add_task, log_route
 from onchain import fetch_onchain_stats
+from answer_cache import ANSWER_CACHE
+from openai_scheduler import hedged_chat_completion, collect_stream, PRIORITY_INTERACTIVE
+from prompt_builder import build_messages, relevant_memory_block, FAST_INSTRUCTION
+from market_snapshot import get_snapshot, format_indicators_block, format_onchain_block
+from question_batcher import QUESTION_BATCHER
+from model_router import classify_route, template_answer, ROUTE_TEMPLATE, ROUTE_FAST, FAST_MODEL_MAX_TOKENS
 
-# Configurar OpenAI (usando GPT-4)
-openai.api_key = OPENAI_API_KEY
 START_TIME = int(time.time())
 
-MIN_TIME_BETWEEN_OPENAI_CALLS = 3
 MIN_TIME_BETWEEN_TELEGRAM_SEND = 2
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
 
-last_openai_call = 0
-last_telegram_send = 0
-_last_photo_send = 0    # ← inicialización necesaria para send_telegram_photo
+# Próximo turno libre de cada chat (envíos, fotos y ediciones comparten el ritmo).
+# Los mensajes se atienden en paralelo: el turno se reserva con este lock
+_NEXT_SEND_SLOT = {}
+_SEND_LOCK = threading.Lock()
+
+def _reserve_send_slot(chat_id, wait=True):
+    """
+    Reserva el siguiente turno de `chat_id` (uno cada MIN_TIME_BETWEEN_TELEGRAM_SEND
+    segundos) y espera a que llegue. Con wait=False solo lo reserva si está libre
+    ya; si no, devuelve False sin esperar.
+    """
+    with _SEND_LOCK:
+        now = time.time()
+        slot = max(now, _NEXT_SEND_SLOT.get(chat_id, 0))
+        if not wait and slot > now:
+            return False
+        _NEXT_SEND_SLOT[chat_id] = slot + MIN_TIME_BETWEEN_TELEGRAM_SEND
+    time.sleep(max(0.0, slot - time.time()))
+    return True
+
+def _release_send_slot(chat_id, retry_after=0):
+    """Tras una llamada (lenta o rechazada con 429), aplaza el siguiente turno de `chat_id`."""
+    with _SEND_LOCK:
+        _NEXT_SEND_SLOT[chat_id] = max(
+            _NEXT_SEND_SLOT.get(chat_id, 0),
+            time.time() + max(retry_after, MIN_TIME_BETWEEN_TELEGRAM_SEND),
+        )
+
+def _retry_after(resp):
+    try:
+        return float(resp.json().get("parameters", {}).get("retry_after", 1))
+    except Exception:
+        return 1.0
+
+# Cache de file_id de fotos ya subidas a Telegram: clave -> (file_id, timestamp)
+# Permite reenviar una imagen sin volver a subirla (ni que Telegram la descargue).
+# Las claves de gráficos cambian con cada vela: se guardan como mucho
+# PHOTO_FILE_ID_CACHE_SIZE, descartando las usadas hace más tiempo.
+PHOTO_FILE_ID_CACHE = OrderedDict()
+_PHOTO_CACHE_LOCK = threading.Lock()
+
+def get_cached_file_id(cache_key, max_age=None):
+    """
+    Devuelve el file_id guardado para `cache_key`, o None si no existe
+    o si tiene más de `max_age` segundos.
+    """
+    if cache_key is None:
+        return None
+    with _PHOTO_CACHE_LOCK:
+        entry = PHOTO_FILE_ID_CACHE.get(cache_key)
+        if entry is None:
+            return None
+        file_id, stored_at = entry
+        if max_age is not None and time.time() - stored_at >= max_age:
+            PHOTO_FILE_ID_CACHE.pop(cache_key, None)
+            return None
+        PHOTO_FILE_ID_CACHE.move_to_end(cache_key)
+    return file_id
+
+def remember_file_id(cache_key, resp_json):
+    """
+    Extrae el file_id (la resolución más grande) de la respuesta de sendPhoto
+    y lo guarda bajo `cache_key`. Devuelve el file_id o None.
+    """
+    try:
+        photos = resp_json.get("result", {}).get("photo", [])
+        file_id = photos[-1]["file_id"] if photos else None
+    except Exception:
+        file_id = None
+    if cache_key is not None and file_id:
+        with _PHOTO_CACHE_LOCK:
+            PHOTO_FILE_ID_CACHE[cache_key] = (file_id, time.time())
+            PHOTO_FILE_ID_CACHE.move_to_end(cache_key)
+            while len(PHOTO_FILE_ID_CACHE) > PHOTO_FILE_ID_CACHE_SIZE:
+                PHOTO_FILE_ID_CACHE.popitem(last=False)
+    return file_id
+
+def forget_file_id(cache_key):
+    """Elimina un file_id del cache (p. ej. si Telegram lo rechaza)."""
+    with _PHOTO_CACHE_LOCK:
+        PHOTO_FILE_ID_CACHE.pop(cache_key, None)
 
 def send_telegram_message(mensaje, chat_id=None, message_thread_id=None):
-    global last_telegram_send
+    """
+    Envía un mensaje de texto a Telegram.
+    Devuelve el message_id del mensaje enviado, o None si falla.
+    """
     if chat_id is None:
         chat_id = TELEGRAM_CHAT_ID
 
-    now = time.time()
-    elapsed = now - last_telegram_send
-    if elapsed < MIN_TIME_BETWEEN_TELEGRAM_SEND:
-        time.sleep(MIN_TIME_BETWEEN_TELEGRAM_SEND - elapsed)
+    _reserve_send_slot(chat_id)
 
     payload = {"chat_id": chat_id, "text": mensaje}
     if message_thread_id is not None:
         payload["message_thread_id"] = message_thread_id
 
+    message_id = None
+    retry_after = 0
     try:
         resp = requests.post(
-            f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage",
+            f"{TELEGRAM_API_BASE}/bot{TELEGRAM_TOKEN}/sendMessage",
             json=payload,
             timeout=30
         )
         if resp.status_code != 200:
             print(f"[Telegram] Error: {resp.text}")
+            if resp.status_code == 429:
+                retry_after = _retry_after(resp)
         else:
+            message_id = resp.json().get("result", {}).get("message_id")
             print(f"[Telegram] Mensaje enviado a {chat_id} en thread {message_thread_id}")
     except Exception as e:
         print(f"[Telegram] Conexión fallida: {e}")
-    last_telegram_send = time.time()
+    _release_send_slot(chat_id, retry_after)
+    return message_id
 
-def send_telegram_photo(photo_url: str, chat_id=None, message_thread_id=None, caption: str = None):
+def edit_telegram_message(mensaje, chat_id, message_id, wait=True):
+    """
+    Reemplaza el texto de un mensaje ya enviado (editMessageText), respetando
+    el mismo turno por chat que los envíos.
+    Devuelve True si Telegram aceptó la edición (o el texto no cambió).
+    Con wait=False (ediciones intermedias del streaming) no espera turno: si
+    el chat está ocupado o Telegram responde 429 devuelve False al momento, y
+    el retry_after aplaza el siguiente turno del chat. Con wait=True espera
+    su turno y, tras un 429, reintenta una vez cuando Telegram lo permita.
+    """
+    payload = {"chat_id": chat_id, "message_id": message_id, "text": mensaje}
+    for _ in range(2 if wait else 1):
+        if not _reserve_send_slot(chat_id, wait=wait):
+            return False
+        retry_after = 0
+        try:
+            resp = requests.post(
+                f"{TELEGRAM_API_BASE}/bot{TELEGRAM_TOKEN}/editMessageText",
+                json=payload,
+                timeout=30
+            )
+        except Exception as e:
+            print(f"[Telegram edit] Conexión fallida: {e}")
+            _release_send_slot(chat_id)
+            return False
+        if resp.status_code == 429:
+            retry_after = _retry_after(resp)
+            print(f"[Telegram edit] Límite de ediciones; siguiente turno en {retry_after}s")
+        _release_send_slot(chat_id, retry_after)
+        if resp.status_code == 200:
+            return True
+        if resp.status_code == 429:
+            continue
+        if "message is not modified" in resp.text:
+            return True
+        print(f"[Telegram edit] Error: {resp.text}")
+        return False
+    return False
+
+def escape_markdown(texto):
+    """Escapado correcto de markdown para las respuestas de GPT."""
+    for ch in ["_", "*", "[", "`"]:
+        texto = texto.replace(ch, f"\\{ch}")
+    return texto
+
+class StreamInterrupted(Exception):
+    """El stream falló a medias; `reply` es el aviso que ya se dejó en el chat."""
+    def __init__(self, reply):
+        super().__init__(reply)
+        self.reply = reply
+
+def stream_completion_to_telegram(chunks, chat_id=None, message_thread_id=None, prefix=""):
+    """
+    Consume una respuesta de OpenAI en modo stream (`chunks`) y la muestra
+    progresivamente: publica un mensaje provisional y lo edita como máximo
+    una vez cada TELEGRAM_EDIT_INTERVAL segundos con el texto acumulado.
+    Las ediciones intermedias se saltan si el chat no tiene turno libre (no
+    frenan la lectura del stream); la edición final sí espera su turno.
+    Devuelve la respuesta completa (sin escapar).
+    Si el stream falla, el mensaje provisional se sustituye por el aviso de
+    error (sin dejar la respuesta a medias) y se lanza StreamInterrupted.
+    """
+    if chat_id is None:
+        chat_id = TELEGRAM_CHAT_ID
+
+    message_id = send_telegram_message(f"{prefix}✍️ Higgs X está escribiendo...", chat_id, message_thread_id)
+    answer = ""
+    shown = ""
+    last_edit = time.time()
+    try:
+        for chunk in chunks:
+            delta = chunk["choices"][0].get("delta", {})
+            answer += delta.get("content") or ""
+            if message_id is None or time.time() - last_edit < TELEGRAM_EDIT_INTERVAL:
+                continue
+            partial = (prefix + escape_markdown(answer.strip()))[:TELEGRAM_MAX_MESSAGE_LENGTH - 2]
+            if partial != shown and edit_telegram_message(partial + " ▌", chat_id, message_id, wait=False):
+                shown = partial
+            last_edit = time.time()
+    except Exception as e:
+        reply = f"⚠️ Error al procesar: {e}"
+        if message_id is None or not edit_telegram_message(reply, chat_id, message_id):
+            send_telegram_message(reply, chat_id, message_thread_id)
+        raise StreamInterrupted(reply) from e
+
+    final = (prefix + escape_markdown(answer.strip()))[:TELEGRAM_MAX_MESSAGE_LENGTH]
+    if message_id is None or not edit_telegram_message(final, chat_id, message_id):
+        # Sin mensaje provisional (o falló la edición): enviamos la respuesta completa
+        send_telegram_message(final, chat_id, message_thread_id)
+    return answer.strip()
+
+def send_telegram_photo(photo_url: str, chat_id=None, message_thread_id=None, caption: str = None,
+                        cache_key=None, max_age=None):
     """
     Envía una foto a Telegram usando sendPhoto.
-    - photo_url: URL pública de la imagen.
+    - photo_url: URL pública de la imagen (o un file_id ya existente).
     - chat_id: destino (por defecto TELEGRAM_CHAT_ID).
     - message_thread_id: si queremos en un topic/thread dentro del grupo.
     - caption: texto opcional que acompaña la foto.
+    - cache_key: si se indica, se reutiliza el file_id guardado bajo esa clave
+      (con antigüedad menor a max_age) en lugar de la URL, y se guarda el
+      file_id devuelto por Telegram para próximos envíos.
+    Devuelve el file_id de la foto enviada, o None si falla.
     """
-    global _last_photo_send
     if chat_id is None:
         chat_id = TELEGRAM_CHAT_ID
 
-    now = time.time()
-    elapsed = now - _last_photo_send
-    if elapsed < MIN_TIME_BETWEEN_TELEGRAM_SEND:
-        time.sleep(MIN_TIME_BETWEEN_TELEGRAM_SEND - elapsed)
+    _reserve_send_slot(chat_id)
 
+    cached_id = get_cached_file_id(cache_key, max_age)
     payload = {
         "chat_id": chat_id,
-        "photo": photo_url
+        "photo": cached_id or photo_url
     }
     if message_thread_id is not None:
         payload["message_thread_id"] = message_thread_id
     if caption is not None:
         payload["caption"] = caption
 
+    file_id = None
     try:
         resp = requests.post(
-            f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendPhoto",
+            f"{TELEGRAM_API_BASE}/bot{TELEGRAM_TOKEN}/sendPhoto",
             json=payload,
             timeout=30
         )
+        if resp.status_code != 200 and cached_id and photo_url:
+            # El file_id ya no es válido: lo descartamos y enviamos la imagen original
+            print(f"[Telegram sendPhoto] file_id rechazado, reenviando original: {resp.text}")
+            forget_file_id(cache_key)
+            payload["photo"] = photo_url
+            resp = requests.post(
+                f"{TELEGRAM_API_BASE}/bot{TELEGRAM_TOKEN}/sendPhoto",
+                json=payload,
+                timeout=30
+            )
         if resp.status_code != 200:
             print(f"[Telegram sendPhoto] Error: {resp.text}")
         else:
-            print(f"[Telegram sendPhoto] Foto enviada a {chat_id} en thread {message_thread_id}")
+            file_id = remember_file_id(cache_key, resp.json())
+            origen = "file_id en cache" if cached_id and payload["photo"] == cached_id else "subida"
+            print(f"[Telegram sendPhoto] Foto enviada a {chat_id} en thread {message_thread_id} ({origen})")
     except Exception as e:
         print(f"[Telegram sendPhoto] Conexión fallida: {e}")
-    _last_photo_send = time.time()
+    _release_send_slot(chat_id)
+    return file_id
 
 def detect_language(texto):
     try:
@@ -111,7 +314,7 @@ def get_updates(offset=None):
         params["offset"] = offset
     try:
         resp = requests.get(
-            f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getUpdates",
+            f"{TELEGRAM_API_BASE}/bot{TELEGRAM_TOKEN}/getUpdates",
             params=params,
             timeout=10,
         )
@@ -124,9 +327,132 @@ def get_updates(offset=None):
         print(f"[Telegram] getUpdates fallo: {e}")
     return []
 
-def handle_telegram_message(update):
-    global last_openai_call
+# Intenciones reconocidas en el thread de Higgs
+INTENT_PROGRAMA = "programa"
+INTENT_GRAFICO = "grafico"
+INTENT_GPT = "gpt"
+
+def classify_intent(text):
+    """
+    Clasifica el mensaje sin hacer ninguna llamada de red:
+      - INTENT_PROGRAMA: "Programa: X en Y minutos"
+      - INTENT_GRAFICO: peticiones de gráfico
+      - INTENT_GPT: cualquier otra consulta (análisis con GPT-4)
+    """
+    lower = text.lower()
+    if lower.startswith("programa"):
+        return INTENT_PROGRAMA
+    if any(w in lower for w in ("grafico", "gráfico")):
+        return INTENT_GRAFICO
+    return INTENT_GPT
+
+# Pool compartido para obtener el contexto de GPT en paralelo
+_CONTEXT_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="contexto")
+# Último valor bueno de cada fuente, usado si no llega a tiempo
+_LAST_GOOD_CONTEXT = {}
+# Valor por defecto si una fuente no responde y no hay valor previo (se muestra "N/D")
+CONTEXT_FALLBACKS = {
+    "article_content": "",
+    "onchain": {},
+    "indicators": {},
+}
+
+class MessageContext:
+    """
+    Contexto de una consulta a GPT construido de forma perezosa:
+    cada fuente (noticia, on-chain, indicadores) se consulta solo
+    la primera vez que se accede a ella, o todas a la vez con gather().
+    """
+    def __init__(self, text):
+        self.text = text
+        self._futures = {}
+        self._deadline_at = None
+        # Si hay una foto de mercado reciente, indicadores y on-chain salen de ella sin red
+        self.snapshot = get_snapshot()
+        if self.snapshot is not None:
+            self.__dict__["indicators"] = self.snapshot.indicators
+            self.__dict__["onchain"] = self.snapshot.onchain
+
+    @cached_property
+    def article_url(self):
+        """URL de la noticia de la que habla el mensaje (índice local, sin red) o None."""
+        try:
+            from news import search_article_by_title
+        except ImportError:
+            return None
+        return search_article_by_title(self.text)
+
+    def _fetch_article_content(self):
+        # Ampliación de la noticia encontrada en el índice local
+        if not self.article_url:
+            return ""
+        try:
+            from news import get_article_content
+            return get_article_content(self.article_url)
+        except:
+            return "No se pudo extraer el contenido de la noticia."
+
+    def _fetch_onchain(self):
+        return fetch_onchain_stats()
+
+    def _fetch_indicators(self):
+        # Datos técnicos (fetch_data + calculate_indicators)
+        data = fetch_data(SYMBOL, TIMEFRAME)
+        return calculate_indicators(data)
+
+    @cached_property
+    def article_content(self):
+        return self._fetch_article_content()
+
+    @cached_property
+    def onchain(self):
+        return self._fetch_onchain()
+
+    @cached_property
+    def indicators(self):
+        return self._fetch_indicators()
+
+    def start(self, names=None):
+        """
+        Lanza en paralelo las fuentes `names` (por defecto todas) aún no
+        obtenidas ni en curso. El plazo común del contexto
+        (CONTEXT_DEADLINE_SECONDS) empieza a contar con el primer start().
+        """
+        if self._deadline_at is None:
+            self._deadline_at = time.time() + CONTEXT_DEADLINE_SECONDS
+        for name in names or CONTEXT_FALLBACKS:
+            if name in self.__dict__ or name in self._futures:
+                continue
+            future = _CONTEXT_EXECUTOR.submit(getattr(self, f"_fetch_{name}"))
+            future.add_done_callback(lambda f, name=name: _remember_context(name, f))
+            self._futures[name] = future
+        return self
+
+    def gather(self, names=None):
+        """
+        Espera las fuentes `names` (por defecto todas; las lanza si aún no
+        están en curso) hasta el plazo común del contexto, así que varias
+        llamadas seguidas no suman plazos. Las que no lleguen a tiempo (o
+        fallen) toman el último valor bueno conocido o el valor por defecto.
+        """
+        self.start(names)
+        pending = {self._futures[name]: name for name in names or CONTEXT_FALLBACKS if name not in self.__dict__}
+        done, not_done = wait(pending, timeout=max(0.0, self._deadline_at - time.time()))
+        for future, name in pending.items():
+            if future in done and future.exception() is None:
+                self.__dict__[name] = future.result()
+            else:
+                motivo = "timeout" if future in not_done else future.exception()
+                print(f"[Telegram Handler] Contexto '{name}' no disponible ({motivo}); usando valor previo.")
+                self.__dict__[name] = _LAST_GOOD_CONTEXT.get(name, CONTEXT_FALLBACKS[name])
+        return self
+
+def _remember_context(name, future):
+    """Guarda el resultado de una fuente (aunque llegue tarde) para futuras consultas."""
+    if not future.cancelled() and future.exception() is None:
+        _LAST_GOOD_CONTEXT[name] = future.result()
 
+def handle_telegram_message(update):
     msg = update.get("message", {})
     text = (msg.get("text") or "").strip()
     chat_id = msg.get("chat", {}).get("id")
@@ -150,161 +476,151 @@ def handle_telegram_message(update):
     if not text or not chat_id or date < START_TIME:
         return
 
-    # BÚSQUEDA y ampliación de noticia (si quieres incluirla, asegúrate de declarar article_content)
-    article_content = ""
-    try:
-        from news import search_article_by_title, get_article_content
-        url = search_article_by_title(text)
-        if url:
-            try:
-                article_content = get_article_content(url)
-            except:
-                article_content = "No se pudo extraer el contenido de la noticia."
-    except ImportError:
-        article_content = ""
-
-    # Obtener datos on-chain
-    onchain = fetch_onchain_stats()
-
     # Guardar mensaje en memoria
     store_message(username, text)
 
-    # COMANDO “Programa: X en Y minutos”
-    if text.lower().startswith("programa"):
-        m = re.search(r"en\s+(\d+)\s+minutos", text.lower())
-        if m:
-            mins = int(m.group(1))
-            run_at = time.time() + mins * 60
-            dt = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run_at))
-            add_task(text, dt)
-            send_telegram_message(
-                f"Tarea guardada: «{text}»\nSe ejecutará a las {dt}",
-                chat_id,
-                thread_id,
-            )
-        else:
-            send_telegram_message(
-                "Formato inválido. Usa: Programa: <tarea> en X minutos",
-                chat_id,
-                thread_id,
-            )
-        return
-
-    # PETICIÓN DE GRÁFICO
-    if any(w in text.lower() for w in ("grafico", "gráfico")):
-        from PrintGraphic import send_graphic, extract_timeframe
+    # Clasificar primero: solo las consultas a GPT necesitan contexto de red
+    intent = classify_intent(text)
+    print(f"[Telegram Handler] Intención detectada: {intent}")
+    if intent == INTENT_PROGRAMA:
+        handle_task_command(text, chat_id, thread_id)
+    elif intent == INTENT_GRAFICO:
+        handle_chart_request(text)
+    else:
+        handle_gpt_question(text, username, chat_id, thread_id, MessageContext(text))
+
+def handle_task_command(text, chat_id, thread_id):
+    """COMANDO “Programa: X en Y minutos”."""
+    m = re.search(r"en\s+(\d+)\s+minutos", text.lower())
+    if m:
+        mins = int(m.group(1))
+        run_at = time.time() + mins * 60
+        dt = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run_at))
+        add_task(text, dt)
+        send_telegram_message(
+            f"Tarea guardada: «{text}»\nSe ejecutará a las {dt}",
+            chat_id,
+            thread_id,
+        )
+    else:
+        send_telegram_message(
+            "Formato inválido. Usa: Programa: <tarea> en X minutos",
+            chat_id,
+            thread_id,
+        )
 
-        tf = extract_timeframe(text)
-        chart_type = "line"
-        if any(k in text.lower() for k in ("vela", "velas", "candlestick", "japonesas")):
-            chart_type = "candlestick"
+def handle_chart_request(text):
+    """PETICIÓN DE GRÁFICO."""
+    from PrintGraphic import send_graphic, extract_timeframe
 
-        send_graphic(
-            TELEGRAM_CHAT_ID,
-            tf,
-            chart_type,
-            message_thread_id=TELEGRAM_HIGGS_THREAD_ID,
-        )
-        return
+    tf = extract_timeframe(text)
+    chart_type = "line"
+    if any(k in text.lower() for k in ("vela", "velas", "candlestick", "japonesas")):
+        chart_type = "candlestick"
 
-    # Consulta a GPT-4
-    system = (
-        "Eres Higgs X, agente de inteligencia infiltrado en la blockchain. "
-        "Analista mercantil y de noticias sobre Bitcoin (BTC). Tu misión es proteger "
-        "al equipo de pérdidas en Bitcoin, usando memoria de contexto. Responde "
-        "conciso, serio y misterioso con un toque creativo y firma como 'Higgs X'."
+    send_graphic(
+        TELEGRAM_CHAT_ID,
+        tf,
+        chart_type,
+        message_thread_id=TELEGRAM_HIGGS_THREAD_ID,
     )
 
-    # Datos técnicos (fetch_data + calculate_indicators)
-    data = fetch_data(SYMBOL, TIMEFRAME)
-    ind = calculate_indicators(data)
-
-    # Funciones auxiliares de formateo (None → "N/D")
-    def fmt_usd(val):
-        return f"${val:,.0f}" if isinstance(val, (int, float)) else "N/D"
-    def fmt_usd_dec(val):
-        return f"${val:,.2f}" if isinstance(val, (int, float)) else "N/D"
-    def fmt_num(val, suffix=""):
-        return f"{val:,.0f}{suffix}" if isinstance(val, (int, float)) else "N/D"
-
-    # Campos on-chain extraídos
-    mc       = onchain.get("marketcap_usd")
-    vol24    = onchain.get("volume_24h_usd")
-    high24   = onchain.get("high_24h_usd")
-    low24    = onchain.get("low_24h_usd")
-    ath      = onchain.get("ath_price_usd")
-    circ_s   = onchain.get("circulating_supply")
-    tot_s    = onchain.get("total_supply")
-    # Si no tienes dominance en onchain, sácalo de calculate_indicators:
-    dom      = ind.get("btc_dominance")  # <-- ya la devolvía calculate_indicators
-    gmcap    = onchain.get("total_marketcap_usd")      # <- estos dos no existen a menos que los añadas a onchain
-    gvol     = onchain.get("total_volume_24h_usd")
-    hr       = onchain.get("hashrate")
-    whales   = onchain.get("whale_count")
-
-    # Formateo
-    mc_str     = fmt_usd(mc)
-    vol24_str  = fmt_usd(vol24)
-    high24_str = fmt_usd_dec(high24)
-    low24_str  = fmt_usd_dec(low24)
-    ath_str    = fmt_usd(ath)
-    circ_str   = fmt_num(circ_s, " BTC")
-    tot_str    = fmt_num(tot_s, " BTC")
-    dom_str    = f"{dom:.2f}%" if isinstance(dom, (int, float)) else "N/D"
-    gmcap_str  = fmt_usd(gmcap)
-    gvol_str   = fmt_usd(gvol)
-    hr_str     = f"{hr:,.2f} TH/s" if isinstance(hr, (int, float)) else "N/D"
-    whales_str = fmt_num(whales)
-
-    prompt = (
-        f"@{username}, aquí Higgs X al habla.\n\n"
-        f"🔍 Indicadores de {SYMBOL}:\n"
-        f"- Precio: ${ind.get('price',0):.2f}\n"
-        f"- RSI: {ind.get('rsi',0):.2f}\n"
-        f"- MACD: {ind.get('macd',0):.2f} (Señal {ind.get('macd_signal',0):.2f})\n"
-        f"- SMA: {ind.get('sma_10',0):.2f}|{ind.get('sma_25',0):.2f}|{ind.get('sma_50',0):.2f}\n"
-        f"- Volumen (nivel): {ind.get('volume_level','N/A')} (CMF: {ind.get('cmf',0):.2f})\n\n"
-        f"🧮 Datos on-chain actuales:\n"
-        f"- MarketCap (USD): {mc_str}\n"
-        f"- Volumen 24h (USD): {vol24_str}\n"
-        f"- High 24h (USD): {high24_str}\n"
-        f"- Low 24h (USD): {low24_str}\n"
-        f"- ATH histórico (USD): {ath_str}\n"
-        f"- Circulating Supply: {circ_str}\n"
-        f"- Total Supply: {tot_str}\n"
-        f"- BTC Dominance: {dom_str}\n"
-        f"- Global MarketCap (USD): {gmcap_str}\n"
-        f"- Global Volumen 24h (USD): {gvol_str}\n"
-        f"- Hashrate (TH/s): {hr_str}\n"
-        f"- Whale Count (≥1000 BTC): {whales_str}\n\n"
-        "Con esta información completa, proporciona un análisis detallado del estado actual del mercado.\n"
-        f"Pregunta: {text}"
-    )
-    if article_content:
-        prompt += "\n\n📰 Ampliación:\n" + article_content
+def _reply(answer, chat_id, thread_id):
+    send_telegram_message(answer, chat_id, thread_id)
+    store_message("Higgs X", answer)
+
+def handle_gpt_question(text, username, chat_id, thread_id, ctx):
+    """
+    Responde una consulta según la ruta elegida por model_router:
+      - ROUTE_TEMPLATE: respuesta local con los indicadores (sin OpenAI)
+      - ROUTE_FAST: modelo rápido con solo los indicadores
+      - ROUTE_DEEP: GPT-4 con indicadores, on-chain y noticia
+    El contexto se obtiene a demanda desde `ctx`.
+    """
+    started = time.time()
+    # Un titular de una noticia conocida va siempre a la ruta profunda
+    route, model = classify_route(text, has_article=bool(ctx.article_url))
+    print(f"[Telegram Handler] Ruta: {route} ({model or 'plantilla'})")
+
+    # Un solo plazo para todo el contexto: las consultas profundas lanzan ya
+    # todas sus fuentes y se mira la plantilla/cache en cuanto llegan los indicadores
+    ctx.start(["indicators"] if route in (ROUTE_TEMPLATE, ROUTE_FAST) else None)
+    ctx.gather(["indicators"])
+    ind = ctx.indicators
+
+    if route == ROUTE_TEMPLATE:
+        _reply(escape_markdown(template_answer(text, username, ind)), chat_id, thread_id)
+        log_route(route, model, text, time.time() - started)
+        return
 
-    # Throttling OpenAI
-    now = time.time()
-    if now - last_openai_call < MIN_TIME_BETWEEN_OPENAI_CALLS:
-        time.sleep(MIN_TIME_BETWEEN_OPENAI_CALLS - (now - last_openai_call))
+    # Preguntas casi idénticas con el mismo estado de mercado se responden desde cache
+    cache_key = ANSWER_CACHE.make_key(text, ind)
+    cached = ANSWER_CACHE.get(cache_key, username)
+    if cached:
+        print("[Telegram Handler] Respuesta servida desde cache.")
+        _reply(escape_markdown(cached), chat_id, thread_id)
+        log_route(route, model, text, time.time() - started, cached=True)
+        return
+
+    snap = ctx.snapshot
+    indicators_block = snap.indicators_block if snap else format_indicators_block(ind)
+    if route == ROUTE_FAST:
+        messages = build_messages(
+            text,
+            username,
+            indicators_block=indicators_block,
+            instruction=FAST_INSTRUCTION,
+        )
+        max_tokens = FAST_MODEL_MAX_TOKENS
+    else:
+        # Esperar al resto del contexto (ya en curso) dentro del mismo plazo
+        ctx.gather()
+        onchain_block = snap.onchain_block if snap else format_onchain_block(ctx.onchain, ind)
+
+        # En picos de tráfico, las preguntas sin noticia asociada se agrupan en un lote
+        if QUESTION_BATCHING and not ctx.article_content:
+            raw_answer = QUESTION_BATCHER.submit(text, username, indicators_block, onchain_block)
+            if raw_answer:
+                ANSWER_CACHE.put(cache_key, raw_answer, username)
+                _reply(escape_markdown(raw_answer), chat_id, thread_id)
+                log_route(route, f"{model} (lote)", text, time.time() - started)
+                return
+
+        messages = build_messages(
+            text,
+            username,
+            indicators_block=indicators_block,
+            onchain_block=onchain_block,
+            memory_block=relevant_memory_block(text),
+            article=ctx.article_content,
+        )
+        max_tokens = 500
 
     try:
-        resp = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=500,
+        chunks = hedged_chat_completion(
+            messages,
+            model=model,
+            priority=PRIORITY_INTERACTIVE,
+            max_tokens=max_tokens,
             temperature=0.7,
         )
-        answer = resp.choices[0].message.content.strip()
-        # Escapado correcto de markdown
-        for ch in ["_", "*", "[", "`"]:
-            answer = answer.replace(ch, f"\\{ch}")
+        if OPENAI_STREAMING:
+            try:
+                raw_answer = stream_completion_to_telegram(chunks, chat_id, thread_id)
+            except StreamInterrupted as e:
+                # El aviso ya sustituyó al mensaje provisional: no se envía otro
+                store_message("Higgs X", e.reply)
+                log_route(route, model, text, time.time() - started)
+                return
+            ANSWER_CACHE.put(cache_key, raw_answer, username)
+            store_message("Higgs X", escape_markdown(raw_answer))
+            log_route(route, model, text, time.time() - started)
+            return
+        raw_answer = collect_stream(chunks)
+        ANSWER_CACHE.put(cache_key, raw_answer, username)
+        answer = escape_markdown(raw_answer)
     except Exception as e:
         answer = f"⚠️ Error al procesar: {e}"
 
-    last_openai_call = time.time()
-    send_telegram_message(answer, chat_id, thread_id)
-    store_message("Higgs X", answer)
+    _reply(answer, chat_id, thread_id)
+    log_route(route, model, text, time.time() - started)
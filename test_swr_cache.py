@@ -0,0 +1,177 @@
+# test_swr_cache.py
+#
+# Pruebas sin red de swr_cache.SWRCache (python -m pytest test_swr_cache.py
+# o python -m unittest test_swr_cache).
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+# Bases SQLite temporales: importar swr_cache carga api_quota y memoria
+_DB_DIR = tempfile.mkdtemp(prefix="higgs_test_")
+for _var, _name in (("MEMORY_DB", "memoria.db"), ("NEWS_DB", "noticias.db"), ("TIMESERIES_DB", "series.db")):
+    os.environ.setdefault(_var, os.path.join(_DB_DIR, _name))
+
+import swr_cache
+from swr_cache import SWRCache, swr_cached
+
+class FakeQuota:
+    """Sustituye a api_quota.QUOTA: acepta o rechaza todas las llamadas."""
+    def __init__(self, allow=True):
+        self.allow = allow
+        self.calls = 0
+
+    def try_acquire(self, provider, endpoint):
+        self.calls += 1
+        return self.allow
+
+    def ttl_factor(self, provider):
+        return 1.0
+
+class CountingFetch:
+    """Fetcher que cuenta llamadas y devuelve (o lanza) lo que se le indique."""
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self.lock:
+            self.calls += 1
+            result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def _age(cache, seconds, *args):
+    """Envejece artificialmente la entrada de `args`."""
+    cache._entries[args].fetched_at -= seconds
+
+class SWRCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._real_quota = swr_cache.QUOTA
+        swr_cache.QUOTA = FakeQuota()
+
+    def tearDown(self):
+        swr_cache.QUOTA = self._real_quota
+
+    def test_fresh_value_is_served_without_refetch(self):
+        fetch = CountingFetch("a")
+        cache = SWRCache("prueba_fresco", fetch, ttl=60)
+        self.assertEqual(cache.get(), "a")
+        result = cache.lookup()
+        self.assertEqual(result.value, "a")
+        self.assertFalse(result.stale)
+        self.assertEqual(fetch.calls, 1)
+
+    def test_stale_value_is_served_while_revalidating(self):
+        gate = threading.Event()
+        values = iter(["viejo", "nuevo"])
+
+        def fetch():
+            value = next(values)
+            if value == "nuevo":
+                gate.wait(5)
+            return value
+
+        cache = SWRCache("prueba_stale", fetch, ttl=10, max_stale=100)
+        self.assertEqual(cache.get(), "viejo")
+        _age(cache, 20)
+        started = time.time()
+        result = cache.lookup()
+        self.assertEqual(result.value, "viejo")
+        self.assertTrue(result.stale)
+        self.assertLess(time.time() - started, 1)   # no esperó al refresco
+        gate.set()
+        cache._entries[()].future.result(5)
+        self.assertEqual(cache.get(), "nuevo")
+
+    def test_too_stale_value_waits_for_refresh(self):
+        fetch = CountingFetch("viejo", "nuevo")
+        cache = SWRCache("prueba_muy_viejo", fetch, ttl=10, max_stale=100)
+        cache.get()
+        _age(cache, 200)
+        self.assertEqual(cache.get(), "nuevo")
+
+    def test_concurrent_misses_share_one_refresh(self):
+        gate = threading.Event()
+        fetch = CountingFetch("valor")
+
+        def slow_fetch():
+            gate.wait(5)
+            return fetch()
+
+        cache = SWRCache("prueba_coalescer", slow_fetch, ttl=60)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        time.sleep(0.2)
+        gate.set()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(results, ["valor"] * 8)
+        self.assertEqual(fetch.calls, 1)
+
+    def test_failed_refresh_keeps_last_good_value(self):
+        fetch = CountingFetch("bueno", RuntimeError("caída"))
+        cache = SWRCache("prueba_fallo", fetch, ttl=10, max_stale=100)
+        self.assertEqual(cache.get(), "bueno")
+        _age(cache, 20)
+        cache.lookup()
+        cache._entries[()].future.result(5)
+        result = cache.lookup()
+        self.assertEqual(result.value, "bueno")
+        health = cache.health()
+        self.assertEqual(health["consecutive_failures"], 1)
+        self.assertIn("caída", health["last_error"])
+
+    def test_invalid_result_without_good_value_is_returned_as_is(self):
+        cache = SWRCache("prueba_invalido", CountingFetch(([], [])), ttl=10,
+                         is_valid=lambda r: bool(r[0]), default="no usado")
+        self.assertEqual(cache.get(), ([], []))
+
+    def test_quota_rejection_without_value_returns_default(self):
+        swr_cache.QUOTA = FakeQuota(allow=False)
+        fetch = CountingFetch(([("BTCUSDT", 5.0)], [("ETHUSDT", -3.0)]))
+        cache = SWRCache("prueba_cuota", fetch, ttl=10, provider="proveedor", default=([], []))
+        self.assertEqual(cache.get(), ([], []))
+        self.assertEqual(fetch.calls, 0)
+        self.assertEqual(cache.health()["last_error"], "cuota agotada")
+
+    def test_quota_rejection_keeps_previous_result(self):
+        fetch = CountingFetch("bueno")
+        cache = SWRCache("prueba_cuota_valor", fetch, ttl=10, max_stale=100, provider="proveedor")
+        self.assertEqual(cache.get(), "bueno")
+        swr_cache.QUOTA = FakeQuota(allow=False)
+        _age(cache, 200)    # demasiado viejo: espera al refresco, que se rechaza
+        result = cache.lookup()
+        self.assertEqual(result.value, "bueno")
+        self.assertEqual(fetch.calls, 1)
+
+    def test_decorator_binds_keyword_and_default_arguments(self):
+        fetch = CountingFetch("x")
+
+        @swr_cached("prueba_decorador", ttl=60)
+        def fetch_days(days_back=100):
+            return fetch(days_back)
+
+        fetch_days()
+        fetch_days(100)
+        fetch_days(days_back=100)
+        self.assertEqual(fetch.calls, 1)
+        fetch_days(7)
+        self.assertEqual(fetch.calls, 2)
+
+    def test_max_entries_evicts_oldest(self):
+        cache = SWRCache("prueba_limite", lambda key: key, ttl=60, max_entries=2)
+        cache.get("a")
+        cache.get("b")
+        cache.get("c")
+        self.assertEqual(len(cache._entries), 2)
+        self.assertNotIn(("a",), cache._entries)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+# timeseries.py
+
+import time
+import sqlite3
+import logging
+import threading
+
+from config import (
+    TIMESERIES_DB,
+    TIMESERIES_RETENTION_RAW,
+    TIMESERIES_RETENTION_5M,
+    TIMESERIES_RETENTION_1H,
+    TIMESERIES_RETENTION_1D,
+)
+
+# Resoluciones guardadas (segundos por punto; 0 = muestra original) y cuánto se conservan (0 = siempre)
+RES_RAW = 0
+RES_5M = 300
+RES_1H = 3600
+RES_1D = 86400
+RETENTION = {
+    RES_RAW: TIMESERIES_RETENTION_RAW,
+    RES_5M: TIMESERIES_RETENTION_5M,
+    RES_1H: TIMESERIES_RETENTION_1H,
+    RES_1D: TIMESERIES_RETENTION_1D,
+}
+PRUNE_INTERVAL = 3600
+
+# Métricas y nombres para el contexto de tendencias del prompt
+TREND_METRICS = {
+    "price": "Precio",
+    "marketcap_usd": "MarketCap",
+    "volume_24h_usd": "Volumen 24h",
+    "btc_dominance": "Dominancia BTC",
+    "total_marketcap_usd": "MarketCap global",
+    "hashrate": "Hashrate",
+}
+TREND_WINDOWS = ((86400, "24h"), (7 * 86400, "esta semana"))
+
+class TimeSeriesStore:
+    """
+    Serie temporal local en SQLite. Cada muestra se guarda tal cual y se
+    agrega al momento en puntos de 5m, 1h y 1d (media, mínimo, máximo y
+    número de muestras), así que no hay procesos de compactación aparte.
+    Cada resolución tiene su retención; las consultas eligen la resolución
+    más fina que aún cubre el rango pedido.
+    """
+    def __init__(self, path=TIMESERIES_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._last_prune = 0
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS points (
+                metric TEXT,
+                resolution INTEGER,
+                ts REAL,
+                avg REAL,
+                min REAL,
+                max REAL,
+                count INTEGER,
+                PRIMARY KEY (metric, resolution, ts)
+            ) WITHOUT ROWID
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def append(self, values, ts=None):
+        """Añade una muestra {métrica: valor} (se ignoran los valores no numéricos)."""
+        ts = ts or time.time()
+        rows = [(m, float(v)) for m, v in values.items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connect()
+            try:
+                for metric, value in rows:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?, ?, 1)',
+                        (metric, RES_RAW, ts, value, value, value)
+                    )
+                    for res in (RES_5M, RES_1H, RES_1D):
+                        conn.execute('''
+                            INSERT INTO points VALUES (?, ?, ?, ?, ?, ?, 1)
+                            ON CONFLICT(metric, resolution, ts) DO UPDATE SET
+                                avg = (avg * count + excluded.avg) / (count + 1),
+                                min = MIN(min, excluded.min),
+                                max = MAX(max, excluded.max),
+                                count = count + 1
+                        ''', (metric, res, ts // res * res, value, value, value))
+                conn.commit()
+                if ts - self._last_prune >= PRUNE_INTERVAL:
+                    self._prune(conn, ts)
+                    self._last_prune = ts
+            finally:
+                conn.close()
+
+    def _prune(self, conn, now):
+        """Aplica la retención de cada resolución."""
+        for res, keep in RETENTION.items():
+            if keep:
+                conn.execute('DELETE FROM points WHERE resolution = ? AND ts < ?', (res, now - keep))
+        conn.commit()
+
+    def pick_resolution(self, start, end=None, max_points=500):
+        """Resolución más fina que conserva datos desde `start` y no pasa de `max_points` puntos."""
+        end = end or time.time()
+        now = time.time()
+        for res in (RES_RAW, RES_5M, RES_1H, RES_1D):
+            keep = RETENTION[res]
+            if keep and start < now - keep:
+                continue
+            if res and (end - start) / res > max_points:
+                continue
+            return res
+        return RES_1D
+
+    def query(self, metric, start, end=None, resolution=None):
+        """Puntos de `metric` entre `start` y `end` como lista de (ts, media, mínimo, máximo)."""
+        end = end or time.time()
+        if resolution is None:
+            resolution = self.pick_resolution(start, end)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                'SELECT ts, avg, min, max FROM points WHERE metric = ? AND resolution = ? '
+                'AND ts >= ? AND ts <= ? ORDER BY ts',
+                (metric, resolution, start, end)
+            ).fetchall()
+        finally:
+            conn.close()
+        return rows
+
+    def latest(self, metric):
+        """Última muestra (ts, valor) de `metric` o None."""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                'SELECT ts, avg FROM points WHERE metric = ? AND resolution = ? ORDER BY ts DESC LIMIT 1',
+                (metric, RES_RAW)
+            ).fetchone()
+        finally:
+            conn.close()
+
+    def first(self, metric, start):
+        """Primer punto (ts, media) de `metric` desde `start`, en la resolución que lo conserva."""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                'SELECT ts, avg FROM points WHERE metric = ? AND resolution = ? AND ts >= ? ORDER BY ts LIMIT 1',
+                (metric, self.pick_resolution(start), start)
+            ).fetchone()
+        finally:
+            conn.close()
+
+    def trend(self, metric, window):
+        """
+        Variación porcentual de `metric` en los últimos `window` segundos
+        (primer punto de la ventana frente a la última muestra). None si no
+        hay datos que cubran al menos la mitad de la ventana.
+        """
+        now = time.time()
+        latest = self.latest(metric)
+        point = self.first(metric, now - window)
+        if not latest or not point or point[0] > now - window / 2:
+            return None
+        first = point[1]
+        if not first:
+            return None
+        return (latest[1] - first) / first * 100
+
+# Serie compartida por todo el bot
+TIMESERIES = TimeSeriesStore()
+
+def record_sample(values, ts=None):
+    """Guarda una muestra recién obtenida de una fuente (sin propagar errores)."""
+    try:
+        TIMESERIES.append(values, ts)
+    except Exception as e:
+        logging.error(f"[Series] Error al guardar la muestra: {e}")
+
+def trend_context():
+    """Texto con las tendencias disponibles (p. ej. "Hashrate: +4.0% esta semana"), o ""."""
+    lines = []
+    for metric, label in TREND_METRICS.items():
+        parts = []
+        for window, window_label in TREND_WINDOWS:
+            try:
+                pct = TIMESERIES.trend(metric, window)
+            except Exception as e:
+                logging.error(f"[Series] Error al calcular la tendencia de {metric}: {e}")
+                pct = None
+            if pct is not None:
+                parts.append(f"{pct:+.1f}% {window_label}")
+        if parts:
+            lines.append(f"- {label}: {', '.join(parts)}")
+    if not lines:
+        return ""
+    return "📈 Tendencias:\n" + "\n".join(lines) + "\n"